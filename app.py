@@ -23,6 +23,25 @@ if 'generator' not in st.session_state:
 if 'processor' not in st.session_state:
     st.session_state.processor = None
 
+@st.cache_resource
+def _get_processor():
+    """Load the data processor once per process, shared across reruns"""
+    processor = DataProcessor()
+    processor.load_data()
+    return processor
+
+@st.cache_resource
+def _get_knowledge_base(_processor):
+    """Build the knowledge base index once (underscore arg skips hashing)"""
+    knowledge_base = AAOIFIKnowledgeBase()
+    knowledge_base.load_data(_processor)
+    return knowledge_base
+
+@st.cache_resource
+def _get_generator(api_keys: tuple):
+    """Create the dataset generator once per unique key set"""
+    return DatasetGenerator(list(api_keys))
+
 def initialize_system():
     """Initialize the AAOIFI knowledge system"""
     try:
@@ -55,15 +74,12 @@ def initialize_system():
             st.error("No valid Gemini API keys found. Please set GEMINI_API_KEY or GEMINI_KEY_1-4 environment variables.")
             return False
             
-        # Initialize components
-        st.session_state.processor = DataProcessor()
-        st.session_state.knowledge_base = AAOIFIKnowledgeBase()
-        st.session_state.generator = DatasetGenerator(valid_keys)
-        
-        # Load data
-        st.session_state.processor.load_data()
-        st.session_state.knowledge_base.load_data(st.session_state.processor)
-        
+        # Initialize components through cached loaders so reruns (every
+        # widget interaction reruns this script) reuse the loaded state
+        st.session_state.processor = _get_processor()
+        st.session_state.knowledge_base = _get_knowledge_base(st.session_state.processor)
+        st.session_state.generator = _get_generator(tuple(valid_keys))
+
         return True
         
     except Exception as e:
@@ -186,67 +202,74 @@ def dataset_generation_page():
                 
             with st.spinner("Generating full dataset... This may take a while."):
                 try:
-                    progress_bar = st.progress(0)
                     status_text = st.empty()
-                    
-                    # Arabic generation
-                    status_text.text("Generating Arabic dataset...")
-                    ar_results = st.session_state.generator.generate_full_dataset("ar", target_count, progress_bar)
-                    
-                    if ar_results['success']:
-                        progress_bar.progress(0.5)
-                        status_text.text("Generating English dataset...")
-                        
-                        # English generation
-                        en_results = st.session_state.generator.generate_full_dataset("en", target_count, progress_bar)
-                        
-                        if en_results['success']:
-                            progress_bar.progress(1.0)
-                            status_text.text("Generation completed!")
-                            
-                            st.success("✅ Full dataset generation completed!")
-                            
-                            # Show final stats
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.metric("Arabic Examples", ar_results['stats']['total'])
-                                st.metric("Arabic True/False", f"{ar_results['stats']['true']}/{ar_results['stats']['false']}")
-                            with col2:
-                                st.metric("English Examples", en_results['stats']['total'])
-                                st.metric("English True/False", f"{en_results['stats']['true']}/{en_results['stats']['false']}")
-                        else:
-                            st.error(f"English generation failed: {en_results.get('error')}")
+
+                    # Submit one Batch Mode job covering both languages
+                    status_text.text("Submitting batch job for Arabic and English...")
+                    results = st.session_state.generator.generate_full_dataset_batch(
+                        target_count,
+                        status_callback=lambda state: status_text.text(f"Batch job state: {state}")
+                    )
+
+                    if results['success']:
+                        status_text.text("Generation completed!")
+                        st.success("✅ Full dataset generation completed!")
+
+                        ar_stats = results['languages']['ar']['stats']
+                        en_stats = results['languages']['en']['stats']
+
+                        # Show final stats
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.metric("Arabic Examples", ar_stats['total'])
+                            st.metric("Arabic True/False", f"{ar_stats['true']}/{ar_stats['false']}")
+                        with col2:
+                            st.metric("English Examples", en_stats['total'])
+                            st.metric("English True/False", f"{en_stats['true']}/{en_stats['false']}")
                     else:
-                        st.error(f"Arabic generation failed: {ar_results.get('error')}")
-                        
+                        st.error(f"Batch generation failed: {results.get('error')}")
+
                 except Exception as e:
                     st.error(f"Error during full generation: {str(e)}")
 
+@st.cache_data(ttl=30)
+def _file_status(paths: tuple):
+    """Stat the required files, cached briefly across reruns"""
+    file_status = []
+    for file_path in paths:
+        exists = Path(file_path).exists()
+        size = Path(file_path).stat().st_size if exists else 0
+        file_status.append({
+            "File": file_path,
+            "Status": "✅ Found" if exists else "❌ Missing",
+            "Size (MB)": f"{size / (1024*1024):.2f}" if exists else "N/A"
+        })
+    return file_status
+
+@st.cache_data(ttl=10)
+def _progress_json():
+    """Read the generation progress file, cached briefly across reruns"""
+    progress_file = Path("progress/state.json")
+    if not progress_file.exists():
+        return None
+    with open(progress_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 def system_status_page():
     st.header("📊 System Status")
-    
+
     # File status
     st.subheader("Required Files Status")
-    required_files = [
+    required_files = (
         "inputs/arabic_cleaned.txt",
         "inputs/english_cleaned.txt",
-        "inputs/arabic_chunks.json", 
+        "inputs/arabic_chunks.json",
         "inputs/english_chunks.json",
         "inputs/arabic_qa_pairs.json",
         "inputs/english_qa_pairs.json"
-    ]
-    
-    file_status = []
-    for file_path in required_files:
-        exists = Path(file_path).exists()
-        size = Path(file_path).stat().st_size if exists else 0
-        file_status.append({
-            "File": file_path,
-            "Status": "✅ Found" if exists else "❌ Missing",
-            "Size (MB)": f"{size / (1024*1024):.2f}" if exists else "N/A"
-        })
-    
-    st.dataframe(pd.DataFrame(file_status))
+    )
+
+    st.dataframe(pd.DataFrame(_file_status(required_files)))
     
     # API Keys status
     st.subheader("API Keys Status")
@@ -272,16 +295,14 @@ def system_status_page():
     
     # Progress status
     st.subheader("Generation Progress")
-    progress_file = Path("progress/state.json")
-    if progress_file.exists():
-        try:
-            with open(progress_file, 'r', encoding='utf-8') as f:
-                progress_data = json.load(f)
+    try:
+        progress_data = _progress_json()
+        if progress_data is not None:
             st.json(progress_data)
-        except Exception as e:
-            st.error(f"Error reading progress file: {str(e)}")
-    else:
-        st.info("No generation progress found.")
+        else:
+            st.info("No generation progress found.")
+    except Exception as e:
+        st.error(f"Error reading progress file: {str(e)}")
 
 def data_explorer_page():
     st.header("🔍 Data Explorer")
@@ -314,10 +335,24 @@ def data_explorer_page():
         
         # Sample data viewer
         st.subheader("Sample Data")
-        
-        data_type = st.selectbox("Select data type to explore", 
+        _sample_viewer(st.session_state.processor)
+
+    except Exception as e:
+        st.error(f"Error exploring data: {str(e)}")
+
+@st.fragment
+def _sample_viewer(processor):
+    """Sample data browser; runs as a fragment so its selectboxes only
+    rerun this block instead of the whole page"""
+    try:
+        ar_chunks = processor.arabic_chunks
+        ar_qa = processor.arabic_qa_pairs
+        en_chunks = processor.english_chunks
+        en_qa = processor.english_qa_pairs
+
+        data_type = st.selectbox("Select data type to explore",
                                 ["Arabic Chunks", "English Chunks", "Arabic Q&A", "English Q&A"])
-        
+
         if data_type == "Arabic Chunks" and ar_chunks:
             chunk_id = st.selectbox("Select chunk ID", range(len(ar_chunks)))
             chunk = ar_chunks[chunk_id]
@@ -1,56 +1,132 @@
 #!/usr/bin/env python3
 import json
+import mmap
 import os
 import re
 import sys
 import argparse
 from pathlib import Path
-from collections import Counter
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+try:
+    import ahocorasick  # optional: C-level multi-pattern scanner
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson  # optional: much faster JSONL parsing
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Single fused pattern for legacy string outputs: one scan extracts both
+# the verdict and the reference instead of two separate re.search calls.
+_OUT_RE = re.compile(r'VERDICT\s*:\s*(?P<v>True|False)\.?|Reference\s*:\s*(?P<r>.+)', re.IGNORECASE)
+
+_WS_B = re.compile(rb'\s+')
 
 def normalize_text(s: str) -> str:
     s = s.lower()
     s = re.sub(r'\s+', ' ', s).strip()
     return s
 
-def load_text_file(path: Path):
-    return normalize_text(path.read_text(encoding='utf-8'))
-
-def reference_in_source(reference: str, source_text: str) -> bool:
-    # if reference is "UNKNOWN", it's allowed but counts as unknown
-    if reference.strip().upper() == "UNKNOWN":
-        return False
-    ref_norm = normalize_text(reference)
-    # direct substring
-    if ref_norm in source_text:
-        return True
-    # fallback: check token overlap (simple)
-    ref_tokens = set(ref_norm.split())
-    source_tokens = set(source_text.split())
-    if not ref_tokens:
-        return False
-    overlap = len(ref_tokens & source_tokens) / len(ref_tokens)
-    return overlap >= 0.75
+def normalize_bytes(b: bytes) -> bytes:
+    """Normalize UTF-8 bytes without decoding: collapse whitespace, ASCII-lower"""
+    return _WS_B.sub(b' ', b).strip().lower()
+
+@lru_cache(maxsize=4)
+def _load_text_cached(path_str: str, mtime_ns: int) -> bytes:
+    """Memoized load+normalize keyed by path and mtime"""
+    with open(path_str, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return normalize_bytes(mm)
+
+def load_text_file(path: Path) -> bytes:
+    """Load and normalize the source text as bytes.
+
+    The file is memory-mapped and normalized with bytes-level operations, so
+    the multi-MB source is never decoded to a Python str; substring checks
+    against the result are C-level memmem scans. Results are cached at module
+    scope by path+mtime, so validating several JSONLs against the same source
+    only pays the normalization once.
+    """
+    return _load_text_cached(str(path), path.stat().st_mtime_ns)
+
+def find_references_in_source(references, source_text):
+    """Batch-check references against source, returning indices of those found.
+
+    References equal to "UNKNOWN" are never matched (allowed, but counted as
+    unknown by the caller). When pyahocorasick is available all references are
+    located in a single pass over the source; otherwise each reference falls
+    back to a C-level substring scan. The token-overlap fallback only runs for
+    the (typically tiny) set of references not found verbatim.
+    """
+    found = set()
+    pending = []
+    for i, ref in enumerate(references):
+        if not ref or ref.strip().upper() == "UNKNOWN":
+            continue
+        # References get the same bytes-level normalization as the source
+        pending.append((i, normalize_bytes(ref.encode('utf-8'))))
+
+    if not pending:
+        return found
+
+    automaton = None
+    if ahocorasick is not None:
+        try:
+            indices_by_ref = defaultdict(list)
+            for i, ref_norm in pending:
+                indices_by_ref[ref_norm].append(i)
+            automaton = ahocorasick.Automaton()
+            for ref_norm in indices_by_ref:
+                automaton.add_word(ref_norm, ref_norm)
+            automaton.make_automaton()
+        except TypeError:
+            # unicode-only pyahocorasick build: fall back to substring scans
+            automaton = None
+
+    if automaton is not None:
+        for _, ref_norm in automaton.iter(source_text):
+            found.update(indices_by_ref[ref_norm])
+    else:
+        for i, ref_norm in pending:
+            if ref_norm in source_text:
+                found.add(i)
+
+    # Token-overlap fallback only for references not found verbatim
+    missing = [(i, ref_norm) for i, ref_norm in pending if i not in found]
+    if missing:
+        source_tokens = set(source_text.split())
+        for i, ref_norm in missing:
+            ref_tokens = set(ref_norm.split())
+            if ref_tokens and len(ref_tokens & source_tokens) / len(ref_tokens) >= 0.75:
+                found.add(i)
+
+    return found
 
 def validate_file(jsonl_path: Path, source_text_path: Path, language: str, max_fabrication_rate=0.05):
     source_text = load_text_file(source_text_path)
-    entries = []
-    with jsonl_path.open('r', encoding='utf-8') as f:
-        for i, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-                entries.append(obj)
-            except Exception as e:
-                print(f"[ERROR] line {i}: invalid JSON => {e}")
-                return False, {"error": "invalid_json", "line": i}
-    if not entries:
-        print("[WARN] No entries found in", jsonl_path)
-        return False, {"error": "no_entries"}
-    stats = {"total": len(entries), "verdicts": Counter(), "suspected_fabrication": 0, "unknown_refs": 0, "bad_schema": 0}
+    stats = {"total": 0, "verdicts": Counter(), "suspected_fabrication": 0, "unknown_refs": 0, "bad_schema": 0}
+    verdict_counts = [0, 0]  # [true, false]: plain list indexing in the hot loop
     failures = []
-    for idx, e in enumerate(entries, 1):
+    ref_checks = []  # (entry index, reference) pairs, batch-verified after the loop
+    # Stream entries one line at a time instead of materializing a list
+    for i, raw_line in enumerate(jsonl_path.open('rb'), 1):
+        line = raw_line.strip()
+        if not line:
+            continue
+        try:
+            e = _json_loads(line)
+        except Exception as err:
+            print(f"[ERROR] line {i}: invalid JSON => {err}")
+            return False, {"error": "invalid_json", "line": i}
+        stats["total"] += 1
+        idx = stats["total"]
         # basic schema expectations
         inst = e.get("instruction") or e.get("instruction_text") or ""
         inp = e.get("input") or ""
@@ -60,22 +136,23 @@ def validate_file(jsonl_path: Path, source_text_path: Path, language: str, max_f
         ref_value = ""
         # output parsing
         if isinstance(out, str):
-            m = re.search(r'VERDICT\s*:\s*(True|False|True\.|False\.)', out, re.IGNORECASE)
-            if m:
-                verdict = m.group(1).lower().startswith('t')
-                stats["verdicts"][ "true" if verdict else "false" ] += 1
-                verdict_found = True
-            ref_m = re.search(r'Reference\s*:\s*(.+)', out)
-            if ref_m:
-                ref_value = ref_m.group(1).strip()
-            else:
+            if out:
+                for m in _OUT_RE.finditer(out):
+                    if m.group('v') is not None:
+                        if not verdict_found:
+                            verdict = m.group('v').lower().startswith('t')
+                            verdict_counts[0 if verdict else 1] += 1
+                            verdict_found = True
+                    elif not ref_value:
+                        ref_value = m.group('r').strip()
+            if not ref_value:
                 # try meta reference
                 ref_value = meta.get("reference", "").strip()
         else:
             # Check if it's the new schema format
             verdict = e.get("verdict")
             if verdict in ["True", "False"]:
-                stats["verdicts"]["true" if verdict == "True" else "false"] += 1
+                verdict_counts[0 if verdict == "True" else 1] += 1
                 verdict_found = True
             ref_value = e.get("reference", "").strip()
             
@@ -93,10 +170,19 @@ def validate_file(jsonl_path: Path, source_text_path: Path, language: str, max_f
         if not ref_value:
             stats["unknown_refs"] += 1
         else:
-            if not reference_in_source(ref_value, source_text):
-                # If ref given but not found -> suspected fabrication
-                stats["suspected_fabrication"] += 1
-                failures.append((idx, "ref_not_found", ref_value))
+            ref_checks.append((idx, ref_value))
+    if stats["total"] == 0:
+        print("[WARN] No entries found in", jsonl_path)
+        return False, {"error": "no_entries"}
+    # batch-verify collected references in one scan of the source
+    found = find_references_in_source([ref for _, ref in ref_checks], source_text)
+    for pos, (idx, ref_value) in enumerate(ref_checks):
+        if pos not in found:
+            # If ref given but not found -> suspected fabrication
+            stats["suspected_fabrication"] += 1
+            failures.append((idx, "ref_not_found", ref_value))
+    # fold the hot-loop counters back into the Counter output schema
+    stats["verdicts"] = Counter({"true": verdict_counts[0], "false": verdict_counts[1]})
     # compute rates
     fab_rate = stats["suspected_fabrication"] / stats["total"]
     unknown_rate = stats["unknown_refs"] / stats["total"]
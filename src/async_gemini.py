@@ -0,0 +1,156 @@
+import asyncio
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+# Deferred for cold-start: google.genai pulls in protobuf/gRPC
+_genai_modules = None
+
+
+def _lazy_genai():
+    global _genai_modules
+    if _genai_modules is None:
+        from google import genai
+        from google.genai import types
+        _genai_modules = (genai, types)
+    return _genai_modules
+
+
+class TokenBucket:
+    """Async token bucket that refills continuously at a per-minute rate"""
+
+    def __init__(self, tokens_per_minute: float):
+        self.rate = tokens_per_minute / 60.0  # tokens per second
+        self.capacity = float(tokens_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0):
+        """Block until the requested amount of tokens is available"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+
+                # Sleep exactly until enough tokens have refilled
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def snapshot(self) -> Tuple[float, float]:
+        """Remaining tokens and their last-refill timestamp"""
+        return self.tokens, self.updated
+
+    def restore(self, state: Tuple[float, float]):
+        """Resume from the fill state of a previous bucket"""
+        tokens, updated = state
+        self.tokens = min(self.capacity, tokens)
+        self.updated = updated
+
+
+class RateLimitedClient:
+    """Concurrent Gemini calls bounded by RPM/TPM budgets.
+
+    Used where Batch Mode is not applicable (e.g. smoke tests): requests are
+    pipelined so the rate window stays full instead of sleeping a fixed
+    interval between sequential calls.
+    """
+
+    def __init__(self, api_keys: List[str], rpm: int = 12, tpm: int = 32000,
+                 max_retries: int = 3, concurrency: Optional[int] = None,
+                 on_request=None):
+        self.api_keys = list(api_keys)
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(concurrency or rpm)
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self._next_key = 0
+        # Called with the api key before each attempt, so the owner can
+        # keep its own per-key accounting in sync with async usage
+        self.on_request = on_request
+        self.logger = logging.getLogger(__name__)
+
+    def snapshot_buckets(self) -> Dict:
+        """Bucket fill state, for carrying across client instances.
+
+        asyncio primitives pin to the loop they first run on, so a client
+        cannot outlive its asyncio.run call — but its spent budget must,
+        or back-to-back batches would each start from full buckets and
+        burst past the per-minute quota.
+        """
+        return {"requests": self.request_bucket.snapshot(),
+                "tokens": self.token_bucket.snapshot()}
+
+    def restore_buckets(self, state: Dict):
+        """Resume from the fill state of a previous instance"""
+        self.request_bucket.restore(state["requests"])
+        self.token_bucket.restore(state["tokens"])
+
+    def _next_api_key(self) -> str:
+        """Rotate through the configured keys round-robin"""
+        key = self.api_keys[self._next_key % len(self.api_keys)]
+        self._next_key += 1
+        return key
+
+    async def generate_content(self, prompt: str,
+                               model: str = "gemini-2.5-flash",
+                               max_output_tokens: int = 1024) -> Tuple[Optional[str], Dict]:
+        """Generate content for one prompt under the shared rate budget"""
+        # Rough token estimate for TPM accounting (~4 chars per token)
+        estimated_tokens = max(1, len(prompt) // 4)
+
+        for attempt in range(self.max_retries):
+            async with self.semaphore:
+                await self.request_bucket.acquire(1)
+                await self.token_bucket.acquire(estimated_tokens)
+
+                genai, types = _lazy_genai()
+                api_key = self._next_api_key()
+                if self.on_request is not None:
+                    self.on_request(api_key)
+                client = genai.Client(api_key=api_key)
+
+                try:
+                    start_time = time.monotonic()
+                    response = await client.aio.models.generate_content(
+                        model=model,
+                        contents=prompt,
+                        config=types.GenerateContentConfig(
+                            temperature=0.7,
+                            max_output_tokens=max_output_tokens
+                        )
+                    )
+
+                    return response.text, {
+                        "model": model,
+                        "attempt": attempt + 1,
+                        "latency": time.monotonic() - start_time,
+                        "success": True
+                    }
+
+                except Exception as e:
+                    error_msg = str(e)
+                    self.logger.warning(f"Async API call failed (attempt {attempt + 1}): {error_msg}")
+
+                    if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg or "quota" in error_msg.lower():
+                        # Exponential backoff on quota errors
+                        await asyncio.sleep(min(2 ** (attempt + 1), 60))
+                    else:
+                        await asyncio.sleep(min(2 ** attempt, 30))
+
+        return None, {
+            "error": "max_retries_exhausted",
+            "attempts": self.max_retries,
+            "model": model
+        }
+
+    async def generate_many(self, prompts: List[str],
+                            model: str = "gemini-2.5-flash",
+                            max_output_tokens: int = 1024) -> List[Tuple[Optional[str], Dict]]:
+        """Generate content for many prompts concurrently"""
+        tasks = [self.generate_content(prompt, model, max_output_tokens) for prompt in prompts]
+        return await asyncio.gather(*tasks, return_exceptions=True)
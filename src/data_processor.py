@@ -1,10 +1,47 @@
 import json
 import os
+import heapq
+import mmap
+from array import array
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional
 import unicodedata
 import re
 
+try:
+    import orjson  # optional: C-level JSON parsing
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Precompiled patterns used by normalize_text on every query and chunk
+_WS_RE = re.compile(r'\s+')
+_AR_DIACRITICS_RE = re.compile(r'[\u064B-\u0652\u0670\u0640]')
+_WORD_RE = re.compile(r'\S+')
+
+
+@lru_cache(maxsize=200000)
+def _normalize_cached(text: str, language: str) -> str:
+    """Cached normalization core; chunk texts repeat across calls"""
+    # Unicode normalization
+    text = unicodedata.normalize('NFKC', text)
+
+    # Remove extra whitespace
+    text = _WS_RE.sub(' ', text).strip()
+
+    # Language-specific normalization
+    if language == "en":
+        text = text.lower()
+    elif language == "ar":
+        # Optional: remove Arabic diacritics for better matching
+        text = _AR_DIACRITICS_RE.sub('', text)
+
+    return text
+
+
 class DataProcessor:
     """Processes AAOIFI data files and handles text normalization"""
     
@@ -13,64 +50,166 @@ class DataProcessor:
         self.english_chunks = []
         self.arabic_qa_pairs = []
         self.english_qa_pairs = []
-        self.arabic_text = ""
-        self.english_text = ""
-        
+        # Cleaned source texts are memory-mapped lazily on first access
+        self._text_paths = {"ar": "inputs/arabic_cleaned.txt", "en": "inputs/english_cleaned.txt"}
+        self._text_cache = {}
+        self._norm_text_cache = {}
+
+        # Inverted index built at load time. Tokens are mapped to small
+        # integer ids so the scoring intersections hash ints, not strings.
+        self._vocab = {"ar": {}, "en": {}}
+        self._norm_tokens = {"ar": [], "en": []}
+        self._postings = {"ar": defaultdict(list), "en": defaultdict(list)}
+
+        # chunk id -> chunk dict, built at load time for O(1) lookups
+        self._chunks_by_id = {"ar": {}, "en": {}}
+
+        # SoA companions to the chunk dicts: compact int arrays for ids and
+        # word counts plus a parallel text list, used by whole-corpus scans
+        self._chunk_ids = {"ar": array('i'), "en": array('i')}
+        self._chunk_word_counts = {"ar": array('i'), "en": array('i')}
+        self._chunk_texts = {"ar": [], "en": []}
+        self._qa_chunk_ids = {"ar": array('i'), "en": array('i')}
+
+        # chunk id -> end offsets of each word, for O(1) excerpt truncation
+        self._word_end_offsets = {"ar": {}, "en": {}}
+
+        # chunk id -> QA pairs, built at load time for O(1) lookups
+        self._qa_by_chunk = {"ar": defaultdict(list), "en": defaultdict(list)}
+
     def load_data(self):
         """Load all required data files"""
         try:
-            # Load chunks
-            with open("inputs/arabic_chunks.json", 'r', encoding='utf-8') as f:
-                self.arabic_chunks = json.load(f)
-                
-            with open("inputs/english_chunks.json", 'r', encoding='utf-8') as f:
-                self.english_chunks = json.load(f)
-                
-            # Load QA pairs
-            with open("inputs/arabic_qa_pairs.json", 'r', encoding='utf-8') as f:
-                self.arabic_qa_pairs = json.load(f)
-                
-            with open("inputs/english_qa_pairs.json", 'r', encoding='utf-8') as f:
-                self.english_qa_pairs = json.load(f)
-                
-            # Load cleaned texts
-            with open("inputs/arabic_cleaned.txt", 'r', encoding='utf-8') as f:
-                self.arabic_text = f.read()
-                
-            with open("inputs/english_cleaned.txt", 'r', encoding='utf-8') as f:
-                self.english_text = f.read()
-                
+            json_paths = {
+                "arabic_chunks": "inputs/arabic_chunks.json",
+                "english_chunks": "inputs/english_chunks.json",
+                "arabic_qa_pairs": "inputs/arabic_qa_pairs.json",
+                "english_qa_pairs": "inputs/english_qa_pairs.json",
+            }
+
+            # Load chunks and QA pairs concurrently: the files are
+            # independent, so reads overlap instead of queueing up
+            with ThreadPoolExecutor(max_workers=len(json_paths)) as executor:
+                futures = {
+                    name: executor.submit(self._load_json, path)
+                    for name, path in json_paths.items()
+                }
+                self.arabic_chunks = futures["arabic_chunks"].result()
+                self.english_chunks = futures["english_chunks"].result()
+                self.arabic_qa_pairs = futures["arabic_qa_pairs"].result()
+                self.english_qa_pairs = futures["english_qa_pairs"].result()
+
+            # Cleaned texts are not read here; they are memory-mapped on
+            # first access so load_data doesn't pay for a multi-MB decode
+            # when the full source text is never needed.
+            for path in self._text_paths.values():
+                if not Path(path).exists():
+                    raise FileNotFoundError(path)
+
+            # Build lookup and search indexes once at load time
+            for language, chunks in (("ar", self.arabic_chunks), ("en", self.english_chunks)):
+                self._chunks_by_id[language] = {chunk.get("id"): chunk for chunk in chunks}
+                self._chunk_ids[language] = array('i', (chunk.get("id", -1) for chunk in chunks))
+                self._chunk_word_counts[language] = array('i', (chunk.get("word_count", 0) for chunk in chunks))
+                self._chunk_texts[language] = [chunk.get("text", "") for chunk in chunks]
+                self._word_end_offsets[language] = {
+                    chunk.get("id"): array('i', (m.end() for m in _WORD_RE.finditer(chunk.get("text", ""))))
+                    for chunk in chunks
+                }
+            for language, qa_pairs in (("ar", self.arabic_qa_pairs), ("en", self.english_qa_pairs)):
+                self._qa_chunk_ids[language] = array('i', (qa.get("chunk_id", -1) for qa in qa_pairs))
+                qa_by_chunk = defaultdict(list)
+                for qa in qa_pairs:
+                    qa_by_chunk[qa.get("chunk_id")].append(qa)
+                self._qa_by_chunk[language] = qa_by_chunk
+            self._build_token_index()
+
         except Exception as e:
             raise Exception(f"Failed to load data files: {str(e)}")
-    
+
+    @staticmethod
+    def _load_json(path: str):
+        """Read and parse a JSON file (orjson when available)"""
+        return _json_loads(Path(path).read_bytes())
+
+    @staticmethod
+    def _read_mmap_text(path: str) -> str:
+        """Read a file through a read-only memory map"""
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[:].decode('utf-8')
+
+    def _load_source_text(self, language: str) -> str:
+        """Lazily load (and cache) the cleaned source text for a language"""
+        if language not in self._text_cache:
+            self._text_cache[language] = self._read_mmap_text(self._text_paths[language])
+        return self._text_cache[language]
+
+    @property
+    def arabic_text(self) -> str:
+        return self._load_source_text("ar")
+
+    @property
+    def english_text(self) -> str:
+        return self._load_source_text("en")
+
+    def get_normalized_source_text(self, language: str) -> str:
+        """Get the normalized source text, backed by a sidecar cache file.
+
+        Normalizing the full source is expensive, so the result is written
+        to an inputs/*.norm.txt sidecar on first computation and memory-mapped
+        on subsequent runs instead of being recomputed.
+        """
+        if language not in self._norm_text_cache:
+            source_path = Path(self._text_paths[language])
+            sidecar = source_path.with_suffix(".norm.txt")
+
+            if sidecar.exists() and sidecar.stat().st_mtime >= source_path.stat().st_mtime:
+                normalized = self._read_mmap_text(str(sidecar))
+            else:
+                normalized = self.normalize_text(self._load_source_text(language), language)
+                try:
+                    sidecar.write_text(normalized, encoding='utf-8')
+                except OSError:
+                    pass  # inputs dir not writable: keep in-memory only
+
+            self._norm_text_cache[language] = normalized
+
+        return self._norm_text_cache[language]
+
+    def _build_token_index(self):
+        """Build per-chunk token-id sets and a token-id -> chunk index inverted index"""
+        for language, chunks in (("ar", self.arabic_chunks), ("en", self.english_chunks)):
+            vocab = {}
+            norm_tokens = []
+            postings = defaultdict(list)
+
+            for idx, chunk in enumerate(chunks):
+                tokens = self.normalize_text(chunk.get("text", ""), language).split()
+                token_ids = frozenset(vocab.setdefault(token, len(vocab)) for token in tokens)
+                norm_tokens.append(token_ids)
+
+                for token_id in token_ids:
+                    postings[token_id].append(idx)
+
+            self._vocab[language] = vocab
+            self._norm_tokens[language] = norm_tokens
+            self._postings[language] = postings
+
     def normalize_text(self, text: str, language: str = "en") -> str:
         """Normalize text for comparison and matching"""
         if not text:
             return ""
-            
-        # Unicode normalization
-        text = unicodedata.normalize('NFKC', text)
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # Language-specific normalization
-        if language == "en":
-            text = text.lower()
-        elif language == "ar":
-            # Optional: remove Arabic diacritics for better matching
-            text = re.sub(r'[\u064B-\u0652\u0670\u0640]', '', text)
-            
-        return text
-    
+
+        return _normalize_cached(text, language)
+
     def get_chunk_by_id(self, chunk_id: int, language: str) -> Optional[Dict]:
         """Get chunk by ID for specified language"""
-        chunks = self.arabic_chunks if language == "ar" else self.english_chunks
-        
-        for chunk in chunks:
-            if chunk.get("id") == chunk_id:
-                return chunk
-        return None
+        index = self._chunks_by_id["ar" if language == "ar" else "en"]
+        return index.get(chunk_id)
     
     def get_source_text(self, language: str) -> str:
         """Get the full source text for specified language"""
@@ -83,47 +222,56 @@ class DataProcessor:
             return ""
             
         text = chunk.get("text", "")
-        
-        # Simple token estimation (split by whitespace)
-        tokens = text.split()
-        if len(tokens) <= max_tokens:
+
+        # Word-boundary offsets were precomputed at load time, so the
+        # token count and truncation point are O(1) lookups
+        offsets = self._word_end_offsets[language].get(chunk_id)
+        if offsets is None:
+            offsets = array('i', (m.end() for m in _WORD_RE.finditer(text)))
+
+        if len(offsets) <= max_tokens:
             return text
-            
-        # Truncate and add ellipsis
-        truncated_tokens = tokens[:max_tokens]
-        return " ".join(truncated_tokens) + "..."
+
+        # Truncate at the end of the max_tokens-th word and add ellipsis
+        return text[:offsets[max_tokens - 1]] + "..."
     
     def search_similar_chunks(self, query: str, language: str, limit: int = 5) -> List[Dict]:
         """Search for chunks similar to query text"""
         chunks = self.arabic_chunks if language == "ar" else self.english_chunks
         normalized_query = self.normalize_text(query, language)
-        
+
         # Simple keyword-based search
         query_tokens = set(normalized_query.split())
-        
+        if not query_tokens:
+            return []
+
+        # Map query tokens to vocabulary ids; out-of-vocabulary tokens can't
+        # overlap with any chunk, so they only count toward the denominator.
+        vocab = self._vocab[language]
+        query_ids = {vocab[token] for token in query_tokens if token in vocab}
+        if not query_ids:
+            return []
+
+        # Only score chunks containing at least one query token
+        postings = self._postings[language]
+        norm_tokens = self._norm_tokens[language]
+        candidates = set().union(*[postings.get(token_id, ()) for token_id in query_ids])
+
         results = []
-        for chunk in chunks:
-            chunk_text = self.normalize_text(chunk.get("text", ""), language)
-            chunk_tokens = set(chunk_text.split())
-            
+        for idx in candidates:
             # Calculate overlap ratio
-            if query_tokens:
-                overlap = len(query_tokens & chunk_tokens) / len(query_tokens)
-                if overlap > 0.1:  # Minimum overlap threshold
-                    results.append({
-                        "chunk": chunk,
-                        "score": overlap
-                    })
-        
-        # Sort by score and return top results
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return [r["chunk"] for r in results[:limit]]
+            overlap = len(query_ids & norm_tokens[idx]) / len(query_tokens)
+            if overlap > 0.1:  # Minimum overlap threshold
+                results.append((overlap, idx))
+
+        # Return top results by score
+        top = heapq.nlargest(limit, results)
+        return [chunks[idx] for _, idx in top]
     
     def get_qa_pairs_by_chunk(self, chunk_id: int, language: str) -> List[Dict]:
         """Get QA pairs associated with a specific chunk"""
-        qa_pairs = self.arabic_qa_pairs if language == "ar" else self.english_qa_pairs
-        
-        return [qa for qa in qa_pairs if qa.get("chunk_id") == chunk_id]
+        qa_by_chunk = self._qa_by_chunk["ar" if language == "ar" else "en"]
+        return list(qa_by_chunk.get(chunk_id, ()))
     
     def validate_data_integrity(self) -> Dict[str, bool]:
         """Validate that all required data is loaded and consistent"""
@@ -136,24 +284,27 @@ class DataProcessor:
             "english_text_loaded": bool(self.english_text)
         }
         
-        # Check chunk ID consistency
+        # Check chunk ID consistency against the compact id arrays
         if self.arabic_chunks:
-            chunk_ids = [chunk.get("id") for chunk in self.arabic_chunks]
-            checks["arabic_chunk_ids_sequential"] = chunk_ids == list(range(len(chunk_ids)))
-            
+            chunk_ids = self._chunk_ids["ar"]
+            checks["arabic_chunk_ids_sequential"] = chunk_ids == array('i', range(len(chunk_ids)))
+
         if self.english_chunks:
-            chunk_ids = [chunk.get("id") for chunk in self.english_chunks]
-            checks["english_chunk_ids_sequential"] = chunk_ids == list(range(len(chunk_ids)))
-        
-        # Check QA-chunk relationships
+            chunk_ids = self._chunk_ids["en"]
+            checks["english_chunk_ids_sequential"] = chunk_ids == array('i', range(len(chunk_ids)))
+
+        # Check QA-chunk relationships via the precomputed id arrays:
+        # every referenced chunk id must fall in [0, max_chunk_id]
         if self.arabic_qa_pairs and self.arabic_chunks:
-            max_chunk_id = max(chunk.get("id", -1) for chunk in self.arabic_chunks)
-            qa_chunk_ids = [qa.get("chunk_id", -1) for qa in self.arabic_qa_pairs]
-            checks["arabic_qa_valid_chunk_refs"] = all(0 <= cid <= max_chunk_id for cid in qa_chunk_ids)
-            
+            qa_chunk_ids = self._qa_chunk_ids["ar"]
+            checks["arabic_qa_valid_chunk_refs"] = (
+                min(qa_chunk_ids) >= 0 and max(qa_chunk_ids) <= max(self._chunk_ids["ar"])
+            )
+
         if self.english_qa_pairs and self.english_chunks:
-            max_chunk_id = max(chunk.get("id", -1) for chunk in self.english_chunks)
-            qa_chunk_ids = [qa.get("chunk_id", -1) for qa in self.english_qa_pairs]
-            checks["english_qa_valid_chunk_refs"] = all(0 <= cid <= max_chunk_id for cid in qa_chunk_ids)
-        
+            qa_chunk_ids = self._qa_chunk_ids["en"]
+            checks["english_qa_valid_chunk_refs"] = (
+                min(qa_chunk_ids) >= 0 and max(qa_chunk_ids) <= max(self._chunk_ids["en"])
+            )
+
         return checks
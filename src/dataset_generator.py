@@ -1,48 +1,103 @@
 import json
+import os
+import re
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
 import time
 import random
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
-import pandas as pd
 from src.gemini_client import GeminiClient
 from src.reference_verifier import ReferenceVerifier
+from src.simhash import simhash, is_near_duplicate
 from src.data_processor import DataProcessor
 
-class DatasetGenerator:
-    """Generates judgmental verification datasets with reference validation"""
-    
-    def __init__(self, api_keys: List[str]):
-        self.gemini_client = GeminiClient(api_keys)
-        self.processor = DataProcessor()
-        self.processor.load_data()
-        self.verifier = ReferenceVerifier(self.processor)
-        
-        # Create output directories
-        self._create_directories()
-        
-        # Generation state
-        self.progress = {
-            "ar": {"completed": 0, "target": 0, "true_count": 0, "false_count": 0},
-            "en": {"completed": 0, "target": 0, "true_count": 0, "false_count": 0}
-        }
-        
-    def _create_directories(self):
-        """Create necessary output directories"""
-        directories = [
-            "data/generation_stage_B/ar",
-            "data/generation_stage_B/en", 
-            "logs",
-            "raw",
-            "progress"
-        ]
-        
-        for directory in directories:
-            Path(directory).mkdir(parents=True, exist_ok=True)
-    
-    def _get_arabic_prompt(self, claim: str, context: str, chunk_id: int) -> str:
-        """Get Arabic generation prompt"""
-        return f"""أنت خبير في التحقق من معايير هيئة المحاسبة والمراجعة للمؤسسات المالية الإسلامية (أيوفي). لا تخترع المراجع.
+try:
+    import orjson  # optional: C-level JSON parsing and serialization
+    _json_loads = orjson.loads
+
+    def _dumps_line(obj: Dict) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+except ImportError:
+    _json_loads = json.loads
+
+    def _dumps_line(obj: Dict) -> bytes:
+        return (json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _find_json(s: str) -> Optional[str]:
+    """Extract the first balanced JSON object from a string.
+
+    A single forward pass tracking brace depth and string literals, so
+    trailing prose or nested objects never trip it up the way a greedy
+    regex can.
+    """
+    start = s.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(s)):
+        ch = s[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return s[start:i + 1]
+
+    return None
+
+# Buffered entropy pool for example ids: one os.urandom syscall yields
+# 256 UUIDs instead of one syscall per uuid4() call
+_RNG_BUF = bytearray()
+
+
+def _uuid_fast() -> str:
+    """Random uuid4-format id drawn from a buffered os.urandom pool"""
+    global _RNG_BUF
+    if len(_RNG_BUF) < 16:
+        _RNG_BUF = bytearray(os.urandom(4096))
+    raw = bytes(_RNG_BUF[:16])
+    del _RNG_BUF[:16]
+    return str(uuid.UUID(bytes=raw, version=4))
+
+
+# Output tree sentinel: once the directories exist, later constructions
+# skip the five stat+mkdir syscalls entirely
+_INIT_SENTINEL = Path("data/generation_stage_B/.initialized")
+
+# Allowed values for in-loop validation, built once per process
+_VALID_VERDICTS = frozenset(("True", "False"))
+_VALID_LANGS = frozenset(("ar", "en"))
+
+# Fields every generated example must carry, checked as one set difference
+_REQUIRED_FIELDS = frozenset((
+    "id", "language", "claim", "context_chunk_id", "context_excerpt",
+    "verdict", "explanation", "reference", "suspected_fabrication",
+    "generator_model", "meta"
+))
+
+# Standard-number patterns used by _generate_perturbations on every seed
+_AR_STD_RE = re.compile(r'رقم \((\d+)\)')
+_EN_STD_RE = re.compile(r'Standard No\. \((\d+)\)')
+
+# Prompt templates assembled once at import; per-example assembly is a single
+# format_map call instead of re-building the ~1KB literal each time
+_AR_PROMPT_TMPL = """أنت خبير في التحقق من معايير هيئة المحاسبة والمراجعة للمؤسسات المالية الإسلامية (أيوفي). لا تخترع المراجع.
 
 أجب بكائن JSON واحد فقط (بدون نص إضافي) وفقاً للمخطط التالي:
 
@@ -59,7 +114,7 @@ class DatasetGenerator:
   "language": "ar",
   "claim": "{claim}",
   "context_chunk_id": {chunk_id},
-  "context_excerpt": "{context[:512]}",
+  "context_excerpt": "{context512}",
   "verdict": "True" أو "False",
   "explanation": "<دليل مختصر مبني على الاقتباس>",
   "reference": "<مقطع متطابق بالضبط أو 'UNKNOWN'>",
@@ -69,9 +124,7 @@ class DatasetGenerator:
   "meta": {{"confidence": <0-1>, "seed_id": "<seed>"}}
 }}"""
 
-    def _get_english_prompt(self, claim: str, context: str, chunk_id: int) -> str:
-        """Get English generation prompt"""
-        return f"""You are an expert AAOIFI verifier (English). DO NOT INVENT REFERENCES.
+_EN_PROMPT_TMPL = """You are an expert AAOIFI verifier (English). DO NOT INVENT REFERENCES.
 
 Respond with EXACTLY one JSON object (no prose) following the schema below.
 
@@ -87,7 +140,7 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
   "language": "en", 
   "claim": "{claim}",
   "context_chunk_id": {chunk_id},
-  "context_excerpt": "{context[:512]}",
+  "context_excerpt": "{context512}",
   "verdict": "True" or "False",
   "explanation": "<concise quote-based evidence>",
   "reference": "<exact matched snippet OR 'UNKNOWN'>",
@@ -96,6 +149,85 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
   "raw_response_path": "raw/<filename>.json",
   "meta": {{"confidence": <0-1>, "seed_id": "<seed>"}}
 }}"""
+
+
+@lru_cache(maxsize=4096)
+def _build_arabic_prompt(claim: str, context: str, chunk_id: int) -> str:
+    """Render the Arabic prompt; memoized since seeds repeat across draws"""
+    return _AR_PROMPT_TMPL.format_map(
+        {"claim": claim, "context": context, "context512": context[:512], "chunk_id": chunk_id})
+
+
+@lru_cache(maxsize=4096)
+def _build_english_prompt(claim: str, context: str, chunk_id: int) -> str:
+    """Render the English prompt; memoized since seeds repeat across draws"""
+    return _EN_PROMPT_TMPL.format_map(
+        {"claim": claim, "context": context, "context512": context[:512], "chunk_id": chunk_id})
+
+
+class DatasetGenerator:
+    """Generates judgmental verification datasets with reference validation"""
+    
+    def __init__(self, api_keys: List[str]):
+        self.gemini_client = GeminiClient(api_keys)
+        self.processor = DataProcessor()
+        self.processor.load_data()
+        self.verifier = ReferenceVerifier(self.processor)
+        
+        # A few hundred (chunk, language) pairs are excerpted thousands of
+        # times over a run; memoize the processor call
+        self._excerpt = lru_cache(maxsize=4096)(self.processor.extract_context_excerpt)
+        
+        # Create output directories
+        self._create_directories()
+        
+        # Per-language shuffled seed permutations for _draw_seed
+        self._qa_perm = {"ar": [], "en": []}
+        
+        # SimHashes of claims already sent to the model, keyed by polarity;
+        # near-duplicates (Hamming distance <= 3) are dropped before spending
+        # an API call. A FALSE claim is by construction a near-duplicate of
+        # the TRUE claim it perturbs, so each polarity is deduped only
+        # against itself
+        self._seen_hashes = {True: [], False: []}
+        
+        # Progress snapshots are written off-thread so checkpoints overlap
+        # with the next batch's network calls; depth 1 so a slow disk
+        # back-pressures instead of queueing writes
+        self._progress_pool = ThreadPoolExecutor(max_workers=1)
+        self._progress_future = None
+        
+        # Generation state
+        self.progress = {
+            "ar": {"completed": 0, "target": 0, "true_count": 0, "false_count": 0},
+            "en": {"completed": 0, "target": 0, "true_count": 0, "false_count": 0}
+        }
+        
+    def _create_directories(self):
+        """Create necessary output directories"""
+        if _INIT_SENTINEL.exists():
+            return
+        
+        directories = [
+            "data/generation_stage_B/ar",
+            "data/generation_stage_B/en", 
+            "logs",
+            "raw",
+            "progress"
+        ]
+        
+        for directory in directories:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+        
+        _INIT_SENTINEL.touch()
+    
+    def _get_arabic_prompt(self, claim: str, context: str, chunk_id: int) -> str:
+        """Get Arabic generation prompt"""
+        return _build_arabic_prompt(claim, context, chunk_id)
+
+    def _get_english_prompt(self, claim: str, context: str, chunk_id: int) -> str:
+        """Get English generation prompt"""
+        return _build_english_prompt(claim, context, chunk_id)
     
     def _generate_perturbations(self, original_claim: str, language: str) -> List[str]:
         """Generate perturbed versions of claim for FALSE examples"""
@@ -105,8 +237,7 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
             # Arabic perturbations
             if "المعيار" in original_claim and "رقم" in original_claim:
                 # Wrong standard number
-                import re
-                match = re.search(r'رقم \((\d+)\)', original_claim)
+                match = _AR_STD_RE.search(original_claim)
                 if match:
                     orig_num = int(match.group(1))
                     new_num = orig_num + 1 if orig_num < 50 else orig_num - 1
@@ -123,8 +254,7 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
             # English perturbations
             if "Standard No." in original_claim:
                 # Wrong standard number
-                import re
-                match = re.search(r'Standard No\. \((\d+)\)', original_claim)
+                match = _EN_STD_RE.search(original_claim)
                 if match:
                     orig_num = int(match.group(1))
                     new_num = orig_num + 1 if orig_num < 50 else orig_num - 1
@@ -146,40 +276,32 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
             
         try:
             # Try direct JSON parse
-            return json.loads(response_text.strip())
-        except json.JSONDecodeError:
-            # Try to extract JSON from text
-            import re
-            
-            # Look for JSON object pattern
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
+            return _json_loads(response_text.strip())
+        except Exception:
+            # Extract the first balanced JSON object from surrounding text
+            candidate = _find_json(response_text)
+            if candidate:
                 try:
-                    return json.loads(json_match.group(0))
-                except json.JSONDecodeError:
+                    return _json_loads(candidate)
+                except Exception:
                     pass
             
             return None
     
     def _validate_example_schema(self, example: Dict) -> Tuple[bool, List[str]]:
         """Validate example against required schema"""
-        required_fields = [
-            "id", "language", "claim", "context_chunk_id", "context_excerpt",
-            "verdict", "explanation", "reference", "suspected_fabrication",
-            "generator_model", "meta"
-        ]
-        
         errors = []
         
-        for field in required_fields:
-            if field not in example:
-                errors.append(f"Missing field: {field}")
+        # One hash-set difference instead of per-field dict lookups
+        missing = _REQUIRED_FIELDS - example.keys()
+        for field in sorted(missing):
+            errors.append(f"Missing field: {field}")
         
         # Validate specific field types
-        if "verdict" in example and example["verdict"] not in ["True", "False"]:
+        if "verdict" in example and example["verdict"] not in _VALID_VERDICTS:
             errors.append("Invalid verdict value")
             
-        if "language" in example and example["language"] not in ["ar", "en"]:
+        if "language" in example and example["language"] not in _VALID_LANGS:
             errors.append("Invalid language value")
             
         if "suspected_fabrication" in example and not isinstance(example["suspected_fabrication"], bool):
@@ -187,52 +309,51 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
         
         return len(errors) == 0, errors
     
-    def _generate_single_example(self, seed_qa: Dict, language: str, 
-                                is_true_example: bool = True) -> Optional[Dict]:
-        """Generate a single verification example"""
-        chunk_id = seed_qa.get("chunk_id", 0)
-        context = self.processor.extract_context_excerpt(chunk_id, language, 512)
-        
+    def _draw_seed(self, language: str) -> Dict:
+        """Draw the next seed QA pair, sampling without replacement.
+
+        A shuffled permutation of the pool is consumed and only reshuffled
+        once exhausted, so no seed repeats before every other seed has been
+        used — maximizing dataset coverage per API call.
+        """
+        perm = self._qa_perm[language]
+        if not perm:
+            qa_pairs = self.processor.arabic_qa_pairs if language == "ar" else self.processor.english_qa_pairs
+            perm.extend(random.sample(qa_pairs, len(qa_pairs)))
+        return perm.pop()
+
+    def _build_claim(self, seed_qa: Dict, language: str, is_true_example: bool) -> str:
+        """Build the claim text for an example, perturbing it for FALSE cases"""
         if is_true_example:
-            claim = seed_qa.get("answer", "")
-        else:
-            # Generate perturbed claim
-            original_claim = seed_qa.get("answer", "")
-            perturbations = self._generate_perturbations(original_claim, language)
-            claim = perturbations[0] if perturbations else original_claim + " (modified)"
-        
-        # Get appropriate prompt
-        if language == "ar":
-            prompt = self._get_arabic_prompt(claim, context, chunk_id)
-            model = "gemini-2.5-flash"
-        else:
-            prompt = self._get_english_prompt(claim, context, chunk_id)
-            model = "gemini-2.5-pro"
-        
-        # Generate content
-        response_text, metadata = self.gemini_client.generate_content(prompt, model)
-        
-        if not response_text:
-            return None
-        
+            return seed_qa.get("answer", "")
+
+        # Generate perturbed claim
+        original_claim = seed_qa.get("answer", "")
+        perturbations = self._generate_perturbations(original_claim, language)
+        return perturbations[0] if perturbations else original_claim + " (modified)"
+
+    def _finalize_example(self, response_text: str, seed_qa: Dict, language: str,
+                         claim: str, chunk_id: int, context: str, model: str,
+                         metadata: Dict) -> Optional[Dict]:
+        """Parse, validate, and reference-verify a raw model response"""
         # Parse response
         example = self._parse_json_response(response_text)
         if not example:
             return None
-        
+
         # Validate schema
         is_valid, errors = self._validate_example_schema(example)
         if not is_valid:
             print(f"Schema validation errors: {errors}")
             return None
-        
+
         # Verify reference
         reference = example.get("reference", "")
         is_ref_valid, ref_details = self.verifier.verify_reference(reference, language)
-        
+
         # Update example with verification results
         example.update({
-            "id": str(uuid.uuid4()),
+            "id": _uuid_fast(),
             "language": language,
             "claim": claim,
             "context_chunk_id": chunk_id,
@@ -245,13 +366,43 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
                 **ref_details
             }
         })
-        
+
         # Override reference if fabricated
         if ref_details.get("suspected_fabrication"):
             example["reference"] = "UNKNOWN"
             example["suspected_fabrication"] = True
-        
+
         return example
+
+    def _generate_single_example(self, seed_qa: Dict, language: str,
+                                is_true_example: bool = True) -> Optional[Dict]:
+        """Generate a single verification example"""
+        chunk_id = seed_qa.get("chunk_id", 0)
+        context = self._excerpt(chunk_id, language, 512)
+        claim = self._build_claim(seed_qa, language, is_true_example)
+
+        claim_hash = simhash(claim)
+        seen = self._seen_hashes[is_true_example]
+        if is_near_duplicate(claim_hash, seen):
+            return None
+        seen.append(claim_hash)
+
+        # Get appropriate prompt
+        if language == "ar":
+            prompt = self._get_arabic_prompt(claim, context, chunk_id)
+            model = "gemini-2.5-flash"
+        else:
+            prompt = self._get_english_prompt(claim, context, chunk_id)
+            model = "gemini-2.5-pro"
+
+        # Generate content
+        response_text, metadata = self.gemini_client.generate_content(prompt, model)
+
+        if not response_text:
+            return None
+
+        return self._finalize_example(response_text, seed_qa, language, claim,
+                                      chunk_id, context, model, metadata)
     
     def run_smoke_test(self, language: str, target_count: int = 20) -> Dict:
         """Run smoke test with small sample"""
@@ -262,46 +413,61 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
             if not qa_pairs:
                 return {"success": False, "error": "No QA pairs available"}
             
+            model = "gemini-2.5-flash" if language == "ar" else "gemini-2.5-pro"
+
+            # Build all prompts up front so the requests can be pipelined
+            pending = []  # (seed_qa, claim, chunk_id, context)
+            prompts = []
+            for i in range(target_count):
+                seed_qa = self._draw_seed(language)
+
+                # Alternate between True and False examples
+                is_true = (i % 2 == 0)
+
+                chunk_id = seed_qa.get("chunk_id", 0)
+                context = self._excerpt(chunk_id, language, 512)
+                claim = self._build_claim(seed_qa, language, is_true)
+
+                if language == "ar":
+                    prompt = self._get_arabic_prompt(claim, context, chunk_id)
+                else:
+                    prompt = self._get_english_prompt(claim, context, chunk_id)
+
+                pending.append((seed_qa, claim, chunk_id, context))
+                prompts.append(prompt)
+
+            # Issue the calls concurrently under a shared rate budget
+            # instead of sleeping a fixed interval between sequential calls
+            responses = self.gemini_client.generate_content_batch(prompts, model)
+
             examples = []
             true_count = 0
             false_count = 0
             failed_attempts = 0
-            max_failures = target_count  # Allow up to target_count failures
-            
-            # Generate examples
-            for i in range(target_count):
-                if failed_attempts >= max_failures:
-                    print(f"Too many failures ({failed_attempts}), stopping early")
-                    break
-                    
-                seed_qa = random.choice(qa_pairs)
-                
-                # Alternate between True and False examples
-                is_true = (true_count < target_count // 2) or (false_count >= target_count // 2)
-                
-                try:
-                    example = self._generate_single_example(seed_qa, language, is_true)
-                    if example:
-                        examples.append(example)
-                        
-                        if example.get("verdict") == "True":
-                            true_count += 1
-                        else:
-                            false_count += 1
-                        
-                        print(f"Generated example {len(examples)}/{target_count}")
+
+            for (seed_qa, claim, chunk_id, context), result in zip(pending, responses):
+                if isinstance(result, Exception):
+                    failed_attempts += 1
+                    print(f"Exception generating example: {str(result)}")
+                    continue
+
+                response_text, metadata = result
+                if not response_text:
+                    failed_attempts += 1
+                    continue
+
+                example = self._finalize_example(response_text, seed_qa, language, claim,
+                                                 chunk_id, context, model, metadata)
+                if example:
+                    examples.append(example)
+
+                    if example.get("verdict") == "True":
+                        true_count += 1
                     else:
-                        failed_attempts += 1
-                        print(f"Failed to generate example {i+1} (attempt {failed_attempts})")
-                        
-                except Exception as e:
+                        false_count += 1
+                else:
                     failed_attempts += 1
-                    print(f"Exception generating example {i+1}: {str(e)}")
-                
-                # Rate limiting with exponential backoff if many failures
-                sleep_time = 2 if failed_attempts > 5 else 1
-                time.sleep(sleep_time)
-            
+
             if not examples:
                 return {
                     "success": False, 
@@ -312,9 +478,9 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
             # Save results
             output_file = f"data/generation_stage_B/{language}/preview_{language}_{len(examples)}.jsonl"
             try:
-                with open(output_file, 'w', encoding='utf-8') as f:
+                with open(output_file, 'wb') as f:
                     for example in examples:
-                        f.write(json.dumps(example, ensure_ascii=False) + '\n')
+                        f.write(_dumps_line(example))
             except Exception as e:
                 print(f"Failed to save results: {str(e)}")
                 output_file = "failed_to_save"
@@ -370,67 +536,124 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
         true_count = 0
         false_count = 0
         batch_size = 50
-        
+        model = "gemini-2.5-flash" if language == "ar" else "gemini-2.5-pro"
+
+        # Dedup within this run only: the generator is held in
+        # st.cache_resource, and hashes carried over from a previous run
+        # would reject every redrawn seed
+        self._seen_hashes = {True: [], False: []}
+
         self.progress[language]["target"] = target_count
         
+        # Single long-lived handle: each example is appended as it is
+        # generated instead of rewriting the accumulated file every batch.
+        # Write to a sidecar and promote it at the end, so a run that dies
+        # early (or produces nothing) never truncates the previous dataset
+        final_file = f"data/generation_stage_B/{language}/judgmental_{language}_final.jsonl"
+        tmp_file = final_file + ".tmp"
+        out_f = open(tmp_file, 'wb')
+        error = None
+
         try:
             while len(examples) < target_count:
-                # Determine if we need more True or False examples
-                need_true = true_count < target_count * 0.5
-                need_false = false_count < target_count * 0.5
-                
-                if not need_true and not need_false:
-                    # Balanced, choose randomly
-                    is_true = random.choice([True, False])
-                elif need_true:
-                    is_true = True
-                else:
-                    is_true = False
+                # Buffer a batch of prompts and issue them concurrently;
+                # the rate budget is enforced by the client, so there is no
+                # fixed sleep between examples
+                pending = []  # (seed_qa, claim, chunk_id, context)
+                prompts = []
+                for _ in range(min(batch_size, target_count - len(examples))):
+                    # Determine if we need more True or False examples
+                    need_true = true_count < target_count * 0.5
+                    need_false = false_count < target_count * 0.5
+                    
+                    if not need_true and not need_false:
+                        # Balanced, choose randomly
+                        is_true = random.choice([True, False])
+                    elif need_true:
+                        is_true = True
+                    else:
+                        is_true = False
+                    
+                    seed_qa = self._draw_seed(language)
+                    chunk_id = seed_qa.get("chunk_id", 0)
+                    context = self._excerpt(chunk_id, language, 512)
+                    claim = self._build_claim(seed_qa, language, is_true)
+                    
+                    # Skip claims trivially similar to same-polarity ones
+                    # already queued
+                    claim_hash = simhash(claim)
+                    seen = self._seen_hashes[is_true]
+                    if is_near_duplicate(claim_hash, seen):
+                        continue
+                    seen.append(claim_hash)
+                    
+                    if language == "ar":
+                        prompt = self._get_arabic_prompt(claim, context, chunk_id)
+                    else:
+                        prompt = self._get_english_prompt(claim, context, chunk_id)
+                    
+                    pending.append((seed_qa, claim, chunk_id, context))
+                    prompts.append(prompt)
                 
-                # Generate example
-                seed_qa = random.choice(qa_pairs)
-                example = self._generate_single_example(seed_qa, language, is_true)
+                # Packed calls amortize per-request network overhead
+                responses = self.gemini_client.generate_batch(prompts, model)
                 
-                if example:
+                batch_generated = 0
+                for (seed_qa, claim, chunk_id, context), (response_text, metadata) in zip(pending, responses):
+                    if not response_text:
+                        continue
+                    
+                    example = self._finalize_example(response_text, seed_qa, language, claim,
+                                                     chunk_id, context, model, metadata)
+                    if not example:
+                        continue
+                    
                     examples.append(example)
+                    out_f.write(_dumps_line(example))
+                    batch_generated += 1
                     
                     if example.get("verdict") == "True":
                         true_count += 1
                     else:
                         false_count += 1
-                    
-                    # Update progress
-                    self.progress[language]["completed"] = len(examples)
-                    self.progress[language]["true_count"] = true_count
-                    self.progress[language]["false_count"] = false_count
-                    
-                    # Save checkpoint every batch_size examples
-                    if len(examples) % batch_size == 0:
-                        checkpoint_file = f"data/generation_stage_B/{language}/checkpoint_{len(examples)}.jsonl"
-                        with open(checkpoint_file, 'w', encoding='utf-8') as f:
-                            for ex in examples:
-                                f.write(json.dumps(ex, ensure_ascii=False) + '\n')
-                        
-                        # Save progress
-                        self._save_progress()
-                        
-                        print(f"Checkpoint: {len(examples)}/{target_count} examples generated")
-                        
-                        if progress_callback:
-                            progress_callback(len(examples) / target_count)
                 
-                time.sleep(0.5)  # Rate limiting
+                if batch_generated == 0:
+                    # Nothing usable came back (e.g. all keys exhausted):
+                    # stop instead of spinning on a dead quota
+                    print(f"Batch produced no examples, stopping at {len(examples)}/{target_count}")
+                    break
+                
+                # Update progress
+                self.progress[language]["completed"] = len(examples)
+                self.progress[language]["true_count"] = true_count
+                self.progress[language]["false_count"] = false_count
+                
+                # Checkpoint: flush appended rows and persist counters;
+                # the data itself is already on disk, so no rewrite needed
+                out_f.flush()
+                if self._progress_future is not None:
+                    self._progress_future.result()
+                self._progress_future = self._progress_pool.submit(self._save_progress)
+                
+                print(f"Checkpoint: {len(examples)}/{target_count} examples generated")
+                
+                if progress_callback:
+                    progress_callback(len(examples) / target_count)
         
         except Exception as e:
             print(f"Error during generation: {str(e)}")
-            return {"success": False, "error": str(e)}
-        
-        # Save final dataset
-        final_file = f"data/generation_stage_B/{language}/judgmental_{language}_final.jsonl"
-        with open(final_file, 'w', encoding='utf-8') as f:
-            for example in examples:
-                f.write(json.dumps(example, ensure_ascii=False) + '\n')
-        
+            error = str(e)
+        finally:
+            out_f.close()
+            self._flush_progress()
+
+        if error is not None or not examples:
+            # Leave the previous final file and splits untouched
+            Path(tmp_file).unlink(missing_ok=True)
+            return {"success": False, "error": error or "no examples generated"}
+
+        os.replace(tmp_file, final_file)
+
         # Generate splits
         self._generate_splits(examples, language)
         
@@ -450,33 +673,138 @@ If you cannot verify, set verdict: "False" (if claim false) or verdict:"False" w
         
         return {"success": True, "stats": stats, "output_file": final_file}
     
+    def generate_full_dataset_batch(self, target_count: int, languages: Tuple[str, ...] = ("ar", "en"),
+                                   status_callback=None) -> Dict:
+        """Generate full datasets for all languages through Gemini Batch Mode.
+
+        Each language's prompts are submitted as one batch job instead of
+        one synchronous call per example, so the run is not gated by
+        per-minute rate limits (and costs half as much per token). Jobs
+        are per-language because a batch job runs a single model, and each
+        language keeps the model the synchronous path uses.
+        """
+        results = {"success": True, "languages": {}}
+
+        for language in languages:
+            qa_pairs = self.processor.arabic_qa_pairs if language == "ar" else self.processor.english_qa_pairs
+            if not qa_pairs:
+                return {"success": False, "error": f"No QA pairs available for {language}"}
+
+            self.progress[language]["target"] = target_count
+            model = "gemini-2.5-flash" if language == "ar" else "gemini-2.5-pro"
+
+            pending = []  # (key, seed_qa, claim, chunk_id, context)
+            keyed_requests = []
+            for i in range(target_count):
+                # Strict alternation keeps the 50/50 True/False balance
+                is_true = (i % 2 == 0)
+                seed_qa = self._draw_seed(language)
+                chunk_id = seed_qa.get("chunk_id", 0)
+                context = self._excerpt(chunk_id, language, 512)
+                claim = self._build_claim(seed_qa, language, is_true)
+
+                if language == "ar":
+                    prompt = self._get_arabic_prompt(claim, context, chunk_id)
+                else:
+                    prompt = self._get_english_prompt(claim, context, chunk_id)
+
+                key = f"{language}-{i}"
+                pending.append((key, seed_qa, claim, chunk_id, context))
+                keyed_requests.append({
+                    "key": key,
+                    "request": {"contents": [{"parts": [{"text": prompt}], "role": "user"}]}
+                })
+
+            responses, state = self.gemini_client.generate_content_batch_mode(
+                keyed_requests, model, status_callback=status_callback)
+
+            if state != "JOB_STATE_SUCCEEDED":
+                return {"success": False,
+                        "error": f"Batch job for {language} ended in state: {state}"}
+
+            # Post-process responses with the same validation path as sync calls
+            metadata = {"model": model, "batch_mode": True}
+            examples = []
+            for key, seed_qa, claim, chunk_id, context in pending:
+                response_text = responses.get(key)
+                if not response_text:
+                    continue
+
+                example = self._finalize_example(response_text, seed_qa, language, claim,
+                                                 chunk_id, context, model, metadata)
+                if example:
+                    examples.append(example)
+
+            true_count = sum(1 for ex in examples if ex.get("verdict") == "True")
+            false_count = len(examples) - true_count
+
+            self.progress[language]["completed"] = len(examples)
+            self.progress[language]["true_count"] = true_count
+            self.progress[language]["false_count"] = false_count
+
+            final_file = f"data/generation_stage_B/{language}/judgmental_{language}_final.jsonl"
+            if examples:
+                with open(final_file, 'wb') as f:
+                    for example in examples:
+                        f.write(_dumps_line(example))
+
+                self._generate_splits(examples, language)
+
+            total = len(examples)
+            fabrication_count = sum(1 for ex in examples if ex.get("suspected_fabrication"))
+
+            results["languages"][language] = {
+                "stats": {
+                    "total": total,
+                    "true": true_count,
+                    "false": false_count,
+                    "fabrication_count": fabrication_count,
+                    "fabrication_rate": fabrication_count / total if total > 0 else 0,
+                    "balance": abs(true_count - false_count) / max(1, total)
+                },
+                "output_file": final_file
+            }
+
+        self._save_progress()
+        return results
+
     def _generate_splits(self, examples: List[Dict], language: str):
         """Generate train/validation/test splits"""
-        random.shuffle(examples)
+        if not examples:
+            # Never truncate existing splits over an empty run
+            return
+
+        # Shuffle an index permutation and route each example to its split
+        # file in one pass, instead of materializing three list slices
+        indices = list(range(len(examples)))
+        random.shuffle(indices)
         
         total = len(examples)
-        train_size = int(total * 0.8)
-        val_size = int(total * 0.1)
+        train_end = int(total * 0.8)
+        val_end = train_end + int(total * 0.1)
         
-        train_examples = examples[:train_size]
-        val_examples = examples[train_size:train_size + val_size]
-        test_examples = examples[train_size + val_size:]
-        
-        # Save splits
         base_path = f"data/generation_stage_B/{language}"
         
-        with open(f"{base_path}/train.jsonl", 'w', encoding='utf-8') as f:
-            for ex in train_examples:
-                f.write(json.dumps(ex, ensure_ascii=False) + '\n')
-        
-        with open(f"{base_path}/val.jsonl", 'w', encoding='utf-8') as f:
-            for ex in val_examples:
-                f.write(json.dumps(ex, ensure_ascii=False) + '\n')
-        
-        with open(f"{base_path}/test.jsonl", 'w', encoding='utf-8') as f:
-            for ex in test_examples:
-                f.write(json.dumps(ex, ensure_ascii=False) + '\n')
+        with ExitStack() as stack:
+            train_f = stack.enter_context(open(f"{base_path}/train.jsonl", 'wb'))
+            val_f = stack.enter_context(open(f"{base_path}/val.jsonl", 'wb'))
+            test_f = stack.enter_context(open(f"{base_path}/test.jsonl", 'wb'))
+            
+            for rank, i in enumerate(indices):
+                if rank < train_end:
+                    out_f = train_f
+                elif rank < val_end:
+                    out_f = val_f
+                else:
+                    out_f = test_f
+                out_f.write(_dumps_line(examples[i]))
     
+    def _flush_progress(self):
+        """Wait for any in-flight background progress write to land"""
+        if self._progress_future is not None:
+            self._progress_future.result()
+            self._progress_future = None
+
     def _save_progress(self):
         """Save current progress to file"""
         progress_file = "progress/state.json"
@@ -0,0 +1,164 @@
+from typing import Optional, Sequence
+
+
+def lev_ratio(a: Sequence, b: Sequence, max_dist: Optional[int] = None) -> float:
+    """Banded Levenshtein similarity ratio in [0, 1].
+
+    Two-row dynamic programming restricted to a diagonal band: cells more
+    than band positions off the diagonal cannot lie on an optimal path for
+    similar strings, so the DP area shrinks roughly 4x versus the full
+    matrix while exact for ratios above ~0.75, the range verification
+    thresholds care about. Works on any indexable sequence: strings, or
+    code-point arrays whose int comparisons skip per-char Unicode checks.
+
+    Callers that only care about distances up to max_dist can pass it as
+    an early-abandon cap: row minima of the DP matrix never decrease, so
+    once a whole row exceeds the cap the final distance must too, and the
+    scan returns 0.0 without filling the remaining rows.
+    """
+    if a == b:
+        return 1.0
+
+    la, lb = len(a), len(b)
+    if la == 0 or lb == 0:
+        return 0.0
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    if max_dist is not None and lb - la > max_dist:
+        return 0.0
+
+    band = max(la // 4, lb - la + 1)
+    infinity = la + lb
+    prev = list(range(lb + 1))
+
+    for i in range(1, la + 1):
+        lo = max(1, i - band)
+        hi = min(lb, i + band)
+        cur = [infinity] * (lb + 1)
+        if lo == 1:
+            cur[0] = i
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            cost = prev[j - 1] if ca == b[j - 1] else prev[j - 1] + 1
+            above = prev[j] + 1
+            if above < cost:
+                cost = above
+            left = cur[j - 1] + 1
+            if left < cost:
+                cost = left
+            cur[j] = cost
+        if max_dist is not None and min(cur[lo:hi + 1]) > max_dist:
+            return 0.0
+        prev = cur
+
+    distance = prev[lb]
+    return max(0.0, 1.0 - distance / lb)
+
+
+def windowed_lev_ratio(reference: Sequence, source: Sequence,
+                       early_exit: float = 1.1) -> float:
+    """Best lev_ratio of reference against sliding windows of a long source.
+
+    A linear prescreen slides a reference-sized window over the source,
+    maintaining its bigram-multiset overlap with the reference in two
+    dict operations per character. One edit destroys at most two bigrams,
+    so a window within edit distance d of the reference keeps at least
+    len(reference) - 1 - 2*d of its bigrams (the classic q-gram count
+    filter): the quadratic DP runs only at offsets clearing that bound,
+    which on unrelated sources is none of them. Callers that only care
+    whether the score clears a threshold can pass it as early_exit; the
+    scan stops at the first window reaching it.
+    """
+    ref_len = len(reference)
+    if ref_len == 0 or not source:
+        return 0.0
+    if len(source) <= ref_len:
+        return lev_ratio(reference, source)
+    if ref_len < 2:
+        return 1.0 if reference[0] in source else 0.0
+
+    if early_exit <= 1.0:
+        max_dist = int((1.0 - early_exit) * ref_len)
+        bound = ref_len - 1 - 2 * max_dist
+        if bound < 1:
+            # Degenerate filter (tiny reference or very loose threshold):
+            # every offset would qualify, so just scan them all
+            best = 0.0
+            for i in range(len(source) - ref_len + 1):
+                ratio = lev_ratio(reference, source[i:i + ref_len], max_dist)
+                if ratio > best:
+                    best = ratio
+                    if best >= early_exit:
+                        break
+            return best
+    else:
+        # No threshold to filter on: the prescreen still locates the
+        # best-overlapping region for the refinement pass below
+        max_dist = None
+        bound = None
+
+    # counts[g] = occurrences of bigram g still missing from the window
+    # (negative once the window holds more copies than the reference)
+    need = {}
+    for k in range(ref_len - 1):
+        g = (reference[k], reference[k + 1])
+        need[g] = need.get(g, 0) + 1
+
+    counts = dict(need)
+    matched = 0
+    for k in range(ref_len - 1):
+        g = (source[k], source[k + 1])
+        c = counts.get(g, 0)
+        if c > 0:
+            matched += 1
+        counts[g] = c - 1
+
+    n_off = len(source) - ref_len + 1
+    candidates = []  # (overlap, offset) pairs clearing the bound
+    best_m = matched
+    best_off = 0
+    if bound is not None and matched >= bound:
+        candidates.append((matched, 0))
+
+    for i in range(1, n_off):
+        g = (source[i - 1], source[i])
+        c = counts[g] + 1
+        counts[g] = c
+        if c > 0:
+            matched -= 1
+        j = i + ref_len - 1
+        g = (source[j - 1], source[j])
+        c = counts.get(g, 0)
+        if c > 0:
+            matched += 1
+        counts[g] = c - 1
+
+        if matched > best_m:
+            best_m = matched
+            best_off = i
+        if bound is not None and matched >= bound:
+            candidates.append((matched, i))
+
+    best = 0.0
+    if candidates:
+        # Highest overlap first, so a clearing window is usually the
+        # first DP evaluated; the cap abandons the rest after a few rows
+        candidates.sort(reverse=True)
+        for m, off in candidates:
+            ratio = lev_ratio(reference, source[off:off + ref_len], max_dist)
+            if ratio > best:
+                best = ratio
+                if best >= early_exit:
+                    return best
+
+    # Refine around the best-overlapping region so callers logging the
+    # similarity see a real score even when no window clears the bound
+    fine_step = max(1, ref_len // 16)
+    for i in range(max(0, best_off - ref_len // 2),
+                   min(n_off - 1, best_off + ref_len // 2) + 1, fine_step):
+        ratio = lev_ratio(reference, source[i:i + ref_len])
+        if ratio > best:
+            best = ratio
+            if best >= early_exit:
+                break
+    return best
@@ -1,12 +1,84 @@
+import asyncio
+import atexit
+import heapq
 import os
+import queue
+import re
+import threading
 import time
 import json
 import logging
+from collections import defaultdict
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
-import uuid
-from google import genai
-from google.genai import types
+from src.async_gemini import RateLimitedClient
+from src.prompt_cache import PromptCache
+
+# google.genai pulls in protobuf/gRPC (~100ms+ of cold start); defer the
+# import until a client is actually constructed
+_genai_modules = None
+
+
+def _lazy_genai():
+    global _genai_modules
+    if _genai_modules is None:
+        from google import genai
+        from google.genai import types
+        _genai_modules = (genai, types)
+    return _genai_modules
+
+
+try:
+    import orjson  # optional: C-level serialization for the raw-response log
+
+    def _dumps_line(obj: dict) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+except ImportError:
+    def _dumps_line(obj: dict) -> bytes:
+        return (json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8')
+
+# Retry-After / retryDelay hints embedded in 429 error messages
+_RETRY_AFTER_RE = re.compile(r"retry.?(?:after|delay)\D*?(\d+)", re.IGNORECASE)
+
+# Header prepended to packed multi-claim prompts (chunk-level batching):
+# the model must answer each numbered request with one JSON object per line
+_PACKED_HEADER = """You will receive {count} independent requests below, each marked "### Request N".
+Answer ALL of them, in order, as JSONL: exactly one JSON object per line,
+line N answering request N. No prose, no blank lines, no code fences.
+
+"""
+
+# Sentinel marking that the output directories already exist
+_INIT_SENTINEL = Path("progress/.initialized")
+
+# Terminal states for Gemini Batch Mode jobs
+_BATCH_TERMINAL_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
+class RateBucket:
+    """Blocking token bucket that drains at exactly rate tokens per period.
+
+    Unlike a fixed inter-request sleep, acquire() only blocks when the next
+    token is genuinely unavailable, so sub-quota callers never wait.
+    """
+
+    def __init__(self, rate: int, per: float = 60.0):
+        self.interval = per / max(1, rate)  # seconds between tokens
+        self.next_token_time = time.monotonic()
+
+    def acquire(self):
+        """Block until the next token is available"""
+        now = time.monotonic()
+        wait = self.next_token_time - now
+        if wait > 0:
+            time.sleep(wait)
+            now = self.next_token_time
+        self.next_token_time = max(now, self.next_token_time) + self.interval
+
 
 class GeminiClient:
     """Handles Gemini API interactions with key rotation and quota management"""
@@ -14,87 +86,140 @@ class GeminiClient:
     def __init__(self, api_keys: List[str]):
         self.api_keys = api_keys
         self.current_key_index = 0
+        # Min-heap of (next_ready_time, key_index): the top is always the
+        # soonest-usable key, so selection is O(log K) instead of an O(K)
+        # scan. Entries are corrected lazily when they surface.
+        self._ready_heap = [(0.0, i) for i in range(len(api_keys))]
+        self._rotation_lock = threading.Lock()
         self.blocked_keys = {}  # key_index -> unblock_time
-        self.request_counts = {}  # key_index -> (count, window_start)
+        self.request_counts = defaultdict(int)  # (key_index, minute_idx) -> count
         self.rate_limit = 12  # requests per minute per key
         self.block_duration = 300  # 5 minutes
+        # Combined budget across keys: each key contributes rate_limit rpm
+        self.rate_bucket = RateBucket(self.rate_limit * max(1, len(api_keys)))
+        # Async batch calls burn the same quota as sync ones: bucket fill
+        # carries across RateLimitedClient instances (each asyncio.run
+        # needs a fresh one) and every async attempt lands in
+        # request_counts through _record_async_request
+        self._async_bucket_state = None
+        self._key_to_index = {key: i for i, key in enumerate(api_keys)}
         
         # Setup logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
-        # Create directories
-        Path("logs").mkdir(exist_ok=True)
-        Path("raw").mkdir(exist_ok=True)
-        Path("progress").mkdir(exist_ok=True)
+        # Create directories (skipped once the sentinel exists)
+        if not _INIT_SENTINEL.exists():
+            Path("logs").mkdir(exist_ok=True)
+            Path("raw").mkdir(exist_ok=True)
+            Path("progress").mkdir(exist_ok=True)
+            _INIT_SENTINEL.touch()
+
+        # Responses are memoized on disk so identical prompts (repeated
+        # seed draws, resumed runs) never pay a second network round-trip
+        self.prompt_cache = PromptCache()
+
+        # Raw responses are appended to a daily NDJSON log by a background
+        # thread, so the generation loop never blocks on disk I/O and the
+        # raw/ directory holds one file per day instead of one per call
+        self._write_q = queue.Queue()
+        self._write_seq = 0
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+        atexit.register(self._drain_writes)
         
-    def get_current_client(self) -> Optional[genai.Client]:
+    def _next_ready_time(self, key_index: int, now: float) -> float:
+        """Earliest monotonic time at which a key can serve a request"""
+        ready = self.blocked_keys.get(key_index, 0.0)
+        minute_idx = int(now // 60)
+        if self.request_counts.get((key_index, minute_idx), 0) >= self.rate_limit:
+            # Saturated for this window: usable again at the next minute
+            ready = max(ready, (minute_idx + 1) * 60.0)
+        return ready
+
+    def get_current_client(self) -> Optional["genai.Client"]:
         """Get current active Gemini client"""
-        current_time = time.time()
-        
-        # Remove expired blocks
-        self.blocked_keys = {
-            k: v for k, v in self.blocked_keys.items() 
-            if v > current_time
-        }
-        
-        # Find next available key
-        attempts = 0
-        while attempts < len(self.api_keys):
-            if self.current_key_index not in self.blocked_keys:
-                # Check rate limit
-                if self._check_rate_limit(self.current_key_index):
-                    api_key = self.api_keys[self.current_key_index]
-                    return genai.Client(api_key=api_key)
-            
-            # Move to next key
-            self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-            attempts += 1
+        genai, _ = _lazy_genai()
+        # Selection is guarded so concurrent callers can't race the heap.
+        # Heap entries may be stale (blocks and rate windows change after
+        # insertion), so each candidate is re-checked and re-pushed with
+        # its true ready time before being skipped.
+        with self._rotation_lock:
+            now = time.monotonic()
+            for _ in range(len(self._ready_heap)):
+                next_ready, key_index = self._ready_heap[0]
+                if next_ready > now:
+                    return None
+                actual = self._next_ready_time(key_index, now)
+                if actual > now:
+                    heapq.heapreplace(self._ready_heap, (actual, key_index))
+                    continue
+                heapq.heapreplace(self._ready_heap, (now, key_index))
+                self.current_key_index = key_index
+                return genai.Client(api_key=self.api_keys[key_index])
         
         return None
     
     def _check_rate_limit(self, key_index: int) -> bool:
         """Check if key is within rate limit"""
-        current_time = time.time()
-        window_start = current_time - 60  # 1 minute window
-        
-        if key_index not in self.request_counts:
-            self.request_counts[key_index] = (0, current_time)
-            return True
-        
-        count, last_window = self.request_counts[key_index]
-        
-        # Reset if window expired
-        if last_window < window_start:
-            self.request_counts[key_index] = (0, current_time)
-            return True
-        
-        return count < self.rate_limit
+        # Counters are keyed by (key, minute): expired windows simply stop
+        # being read, so there is no reset branch on the hot path
+        minute_idx = int(time.monotonic() // 60)
+        return self.request_counts.get((key_index, minute_idx), 0) < self.rate_limit
     
     def _record_request(self, key_index: int):
         """Record a request for rate limiting"""
-        current_time = time.time()
-        
-        if key_index in self.request_counts:
-            count, _ = self.request_counts[key_index]
-            self.request_counts[key_index] = (count + 1, current_time)
-        else:
-            self.request_counts[key_index] = (1, current_time)
+        minute_idx = int(time.monotonic() // 60)
+        self.request_counts[(key_index, minute_idx)] += 1
+
+    def _record_async_request(self, api_key: str):
+        """Record an async request against the shared per-key counters"""
+        key_index = self._key_to_index.get(api_key)
+        if key_index is not None:
+            self._record_request(key_index)
     
-    def _block_key(self, key_index: int):
-        """Block a key for the specified duration"""
-        self.blocked_keys[key_index] = time.time() + self.block_duration
-        self.logger.warning(f"Blocked key {key_index} for {self.block_duration} seconds")
+    def _block_key(self, key_index: int, duration: Optional[float] = None):
+        """Block a key for the specified duration (default block_duration)"""
+        if duration is None:
+            duration = self.block_duration
+        self.blocked_keys[key_index] = time.monotonic() + duration
+        self.logger.warning(f"Blocked key {key_index} for {int(duration)} seconds")
     
+    def _writer_loop(self):
+        """Drain queued raw responses into the daily NDJSON log"""
+        open_path = None
+        out_f = None
+        pending = 0
+        while True:
+            path, record = self._write_q.get()
+            try:
+                if path != open_path:
+                    if out_f:
+                        out_f.close()
+                    out_f = open(path, 'ab')
+                    open_path = path
+                    pending = 0
+                out_f.write(_dumps_line(record))
+                pending += 1
+                # Flush periodically and whenever the queue goes idle
+                if pending >= 64 or self._write_q.empty():
+                    out_f.flush()
+                    pending = 0
+            except Exception as e:
+                self.logger.warning(f"Raw response write failed: {str(e)}")
+            finally:
+                self._write_q.task_done()
+
+    def _drain_writes(self):
+        """Block until all queued raw responses have been written"""
+        self._write_q.join()
+
     def _save_raw_response(self, response_data: dict) -> str:
-        """Save raw response to file and return path"""
-        timestamp = int(time.time())
-        filename = f"raw/response_{timestamp}_{uuid.uuid4().hex[:8]}.json"
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(response_data, f, ensure_ascii=False, indent=2)
-        
-        return filename
+        """Queue raw response for the background writer and return its path"""
+        filename = f"raw/responses_{time.strftime('%Y%m%d')}.ndjson"
+        self._write_seq += 1
+        self._write_q.put_nowait((filename, response_data))
+        return f"{filename}#{self._write_seq}"
     
     def generate_content(self, prompt: str, model: str = "gemini-2.5-flash", 
                         max_retries: int = 3) -> Tuple[Optional[str], dict]:
@@ -104,6 +229,12 @@ class GeminiClient:
         Returns:
             Tuple of (response_text, metadata)
         """
+        cached = self.prompt_cache.get(prompt)
+        if cached is not None:
+            response_text, metadata = cached
+            metadata["cache_hit"] = True
+            return response_text, metadata
+
         for attempt in range(max_retries):
             client = self.get_current_client()
             
@@ -116,12 +247,17 @@ class GeminiClient:
                 }
             
             try:
-                start_time = time.time()
+                # Wait only as long as the token bucket requires, instead
+                # of a fixed sleep between calls
+                self.rate_bucket.acquire()
+                
+                start_time = time.monotonic()
                 
                 # Record request for rate limiting
                 self._record_request(self.current_key_index)
                 
                 # Make API call
+                _, types = _lazy_genai()
                 response = client.models.generate_content(
                     model=model,
                     contents=prompt,
@@ -131,7 +267,7 @@ class GeminiClient:
                     )
                 )
                 
-                end_time = time.time()
+                end_time = time.monotonic()
                 
                 # Prepare response metadata
                 metadata = {
@@ -153,6 +289,9 @@ class GeminiClient:
                 raw_path = self._save_raw_response(raw_data)
                 metadata["raw_response_path"] = raw_path
                 
+                if response.text:
+                    self.prompt_cache.put(prompt, response.text, metadata)
+                
                 return response.text, metadata
                 
             except Exception as e:
@@ -161,11 +300,11 @@ class GeminiClient:
                 
                 # Handle specific error types
                 if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg or "quota" in error_msg.lower():
-                    self._block_key(self.current_key_index)
-                    # Try next key immediately
-                    self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-                    # Short delay before trying next key
-                    time.sleep(1)
+                    # Honor the server's Retry-After hint when one is given
+                    retry_match = _RETRY_AFTER_RE.search(error_msg)
+                    retry_after = int(retry_match.group(1)) if retry_match else None
+                    self._block_key(self.current_key_index, retry_after)
+                    # Next get_current_client call rotates past the block
                     continue
                 elif "5" in error_msg[:3] or "server" in error_msg.lower():  # 5xx errors or server issues
                     # Exponential backoff for server errors
@@ -174,8 +313,7 @@ class GeminiClient:
                     time.sleep(wait_time)
                     continue
                 else:
-                    # Other errors - but still retry with different key
-                    self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
+                    # Other errors - retry (rotation picks a different key)
                     time.sleep(2)  # Wait before retry
                     if attempt < max_retries - 1:  # Don't continue on last attempt
                         continue
@@ -194,9 +332,194 @@ class GeminiClient:
             "model": model
         }
     
+    def generate_content_batch(self, prompts: List[str],
+                               model: str = "gemini-2.5-flash",
+                               max_output_tokens: int = 1024) -> List[Tuple[Optional[str], dict]]:
+        """
+        Generate content for many prompts concurrently.
+
+        The workload is I/O-bound, so issuing the requests concurrently under
+        a shared RPM budget (spread across all non-blocked keys) is close to
+        linearly faster than sequential calls, up to the combined quota.
+        Prompts already in the cache are answered without dispatching.
+
+        Returns:
+            List of (response_text, metadata) tuples, in prompt order
+        """
+        results: List[Optional[Tuple[Optional[str], dict]]] = [None] * len(prompts)
+        misses = []  # (position, prompt) pairs that need a network call
+        for i, prompt in enumerate(prompts):
+            cached = self.prompt_cache.get(prompt)
+            if cached is not None:
+                response_text, metadata = cached
+                metadata["cache_hit"] = True
+                results[i] = (response_text, metadata)
+            else:
+                misses.append((i, prompt))
+
+        if not misses:
+            return results
+
+        current_time = time.monotonic()
+        available_keys = [
+            key for i, key in enumerate(self.api_keys)
+            if self.blocked_keys.get(i, 0) <= current_time
+        ]
+        if not available_keys:
+            available_keys = list(self.api_keys)
+
+        rate_client = RateLimitedClient(
+            available_keys,
+            rpm=self.rate_limit * len(available_keys),
+            on_request=self._record_async_request
+        )
+        # Resume from the previous batch's spent budget instead of full
+        # buckets, so consecutive calls cannot burst past the quota
+        if self._async_bucket_state is not None:
+            rate_client.restore_buckets(self._async_bucket_state)
+        try:
+            raw_results = asyncio.run(
+                rate_client.generate_many([p for _, p in misses],
+                                          model, max_output_tokens))
+        finally:
+            self._async_bucket_state = rate_client.snapshot_buckets()
+
+        for (i, prompt), result in zip(misses, raw_results):
+            if isinstance(result, Exception):
+                results[i] = (None, {"error": str(result), "model": model})
+            else:
+                response_text, metadata = result
+                if response_text:
+                    self.prompt_cache.put(prompt, response_text, metadata)
+                results[i] = result
+        return results
+
+    @staticmethod
+    def _split_packed_response(response_text: Optional[str], count: int) -> List[Optional[str]]:
+        """Split a packed JSONL response back into per-request texts"""
+        parts: List[Optional[str]] = [None] * count
+        if not response_text:
+            return parts
+
+        lines = [line for line in response_text.splitlines()
+                 if line.strip().startswith("{")]
+        for i, line in enumerate(lines[:count]):
+            parts[i] = line
+        return parts
+
+    def generate_batch(self, prompts: List[str], model: str = "gemini-2.5-flash",
+                       group_size: int = 4) -> List[Tuple[Optional[str], dict]]:
+        """
+        Generate content for many prompts, packing group_size prompts per call.
+
+        Each API call carries the same TLS + HTTP overhead regardless of
+        payload, so packing K claims into one request amortizes that
+        overhead K-fold; the packed calls are still issued concurrently
+        under the shared rate budget.
+
+        Returns:
+            List of (response_text, metadata) tuples, in prompt order
+        """
+        if group_size <= 1:
+            return self.generate_content_batch(prompts, model)
+
+        groups = [prompts[start:start + group_size]
+                  for start in range(0, len(prompts), group_size)]
+        packed = []
+        for group in groups:
+            if len(group) == 1:
+                packed.append(group[0])
+            else:
+                packed.append(
+                    _PACKED_HEADER.format(count=len(group)) +
+                    "\n\n".join(f"### Request {i + 1}\n{prompt}"
+                                 for i, prompt in enumerate(group))
+                )
+
+        packed_results = self.generate_content_batch(
+            packed, model, max_output_tokens=1024 * group_size)
+
+        results: List[Tuple[Optional[str], dict]] = []
+        for group, (response_text, metadata) in zip(groups, packed_results):
+            if len(group) == 1:
+                results.append((response_text, metadata))
+                continue
+            for part in self._split_packed_response(response_text, len(group)):
+                results.append((part, metadata))
+        return results
+
+    def generate_content_batch_mode(self, keyed_requests: List[Dict], model: str = "gemini-2.5-flash",
+                                    poll_interval: int = 30, timeout: int = 24 * 3600,
+                                    status_callback=None) -> Tuple[Dict[str, Optional[str]], str]:
+        """
+        Run many generation requests through Gemini Batch Mode.
+
+        Batch Mode is half the price of the synchronous API and is not
+        subject to per-minute rate limits, so it shifts the bottleneck from
+        quota to raw throughput for large runs.
+
+        Args:
+            keyed_requests: list of {"key": str, "request": {...}} dicts in
+                Batch API request format
+            status_callback: optional callable invoked with the job state on
+                each poll, for progress reporting
+
+        Returns:
+            Tuple of (responses keyed by request key, final job state)
+        """
+        client = self.get_current_client()
+        if not client:
+            self.logger.error("No available API keys for batch submission")
+            return {}, "NO_AVAILABLE_KEYS"
+
+        try:
+            job = client.batches.create(
+                model=model,
+                src=[req["request"] for req in keyed_requests],
+                config={"display_name": f"datasetforge_{int(time.time())}"}
+            )
+            self.logger.info(f"Submitted batch job {job.name} with {len(keyed_requests)} requests")
+
+            deadline = time.monotonic() + timeout
+            while True:
+                state = getattr(job.state, "name", str(job.state))
+                if state in _BATCH_TERMINAL_STATES:
+                    break
+                if time.monotonic() > deadline:
+                    self.logger.error(f"Batch job {job.name} timed out in state {state}")
+                    return {}, "TIMEOUT"
+                if status_callback:
+                    status_callback(state)
+                time.sleep(poll_interval)
+                job = client.batches.get(name=job.name)
+
+        except Exception as e:
+            self.logger.error(f"Batch job failed: {str(e)}")
+            return {}, "ERROR"
+
+        responses: Dict[str, Optional[str]] = {}
+        if state == "JOB_STATE_SUCCEEDED":
+            inlined = getattr(getattr(job, "dest", None), "inlined_responses", None) or []
+            # Inlined responses come back in request order
+            for req, item in zip(keyed_requests, inlined):
+                response = getattr(item, "response", None)
+                responses[req["key"]] = getattr(response, "text", None) if response else None
+
+        return responses, state
+
     def get_key_status(self) -> Dict:
         """Get status of all API keys"""
-        current_time = time.time()
+        current_time = time.monotonic()
+        
+        # Drop expired blocks and stale minute counters here, off the
+        # per-request hot path
+        self.blocked_keys = {
+            k: v for k, v in self.blocked_keys.items()
+            if v > current_time
+        }
+        current_minute = int(current_time // 60)
+        for stale_key in [k for k in self.request_counts if k[1] < current_minute - 2]:
+            del self.request_counts[stale_key]
         
         status = {
             "total_keys": len(self.api_keys),
@@ -218,12 +541,12 @@ class GeminiClient:
                 status["available_keys"] += 1
             
             # Check rate limit status
-            if i in self.request_counts:
-                count, window_start = self.request_counts[i]
+            count = self.request_counts.get((i, current_minute), 0)
+            if count:
                 status["rate_limits"][i] = {
                     "requests_in_window": count,
                     "limit": self.rate_limit,
-                    "window_start": window_start
+                    "window_start": current_minute * 60
                 }
         
         return status
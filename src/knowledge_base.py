@@ -1,18 +1,164 @@
 import json
 import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from array import array
 from typing import Dict, List, Optional
-from src.data_processor import DataProcessor
+from src.data_processor import DataProcessor, _normalize_cached
+from src.reference_verifier import _SENT_SPLIT_RE
+
+try:
+    import ahocorasick  # optional: C-level multi-pattern scanner
+except ImportError:
+    ahocorasick = None
+
+# Common Islamic finance terms matched against every chunk during indexing
+_AR_TERMS = (
+    'الربا', 'الغرر', 'الميسر', 'الحلال', 'الحرام', 'المرابحة', 'المضاربة',
+    'الإجارة', 'السلم', 'الاستصناع', 'المشاركة', 'الصكوك', 'الضمان',
+    'العملات', 'البطاقة', 'الائتمان', 'التمويل', 'الاستثمار'
+)
+_EN_TERMS = (
+    'riba', 'gharar', 'halal', 'haram', 'murabahah', 'mudarabah',
+    'ijarah', 'salam', 'istisna', 'musharakah', 'sukuk', 'guarantee',
+    'currency', 'card', 'credit', 'financing', 'investment', 'islamic',
+    'sharia', 'shariah', 'permissible', 'prohibited'
+)
+
+
+def _build_term_scanner(terms):
+    """Build a scanner finding all dictionary terms in one pass over a text.
+
+    With pyahocorasick installed a single automaton walk replaces the
+    per-term substring scans; otherwise a combined lookahead alternation
+    (longest-first, expanding nested terms) does the same in one regex pass.
+    """
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for term in terms:
+            automaton.add_word(term, term)
+        automaton.make_automaton()
+        return lambda text: [term for _, term in automaton.iter(text)]
+
+    ordered = sorted(terms, key=len, reverse=True)
+    pattern = re.compile('(?=(' + '|'.join(re.escape(term) for term in ordered) + '))')
+    # Terms nested inside longer terms (e.g. sharia in shariah) are emitted
+    # alongside their container to match per-term scan semantics
+    nested = {term: [t for t in terms if t != term and t in term] for term in terms}
+
+    def scan(text):
+        found = []
+        for term in pattern.findall(text):
+            found.append(term)
+            found.extend(nested[term])
+        return found
+
+    return scan
+
+
+_scan_ar_terms = _build_term_scanner(_AR_TERMS)
+_scan_en_terms = _build_term_scanner(_EN_TERMS)
+
+# Patterns applied to every chunk during indexing and per query; compiled
+# once at import instead of per call
+_AR_STD_RE = re.compile(r'\u0627\u0644\u0645\u0639\u064a\u0627\u0631 \u0627\u0644\u0634\u0631\u0639\u064a \u0631\u0642\u0645 \((\d+)\)')
+_EN_STD_RE = re.compile(r"Shari'ah Standard No\. \((\d+)\)")
+_AR_CLAUSE_RE = re.compile(r'\u0627\u0644\u0628\u0646\u062f \d+/\d+/?\d*')
+_EN_CLAUSE_RE = re.compile(r'Clause \d+/\d+/?\d*')
+_EN_WORD_RE = re.compile(r'\b\w{4,}\b')
+# Standard and clause references fused into one alternation so
+# _find_reference_in_chunk scans a chunk once instead of twice
+_AR_ANY_REF = re.compile(
+    r'(?P<std>\u0627\u0644\u0645\u0639\u064a\u0627\u0631 \u0627\u0644\u0634\u0631\u0639\u064a \u0631\u0642\u0645 \(\d+\))'
+    r'|(?P<clause>\u0627\u0644\u0628\u0646\u062f \d+/\d+/?\d*)')
+_EN_ANY_REF = re.compile(
+    r"(?P<std>Shari'ah Standard No\. \(\d+\))"
+    r'|(?P<clause>Clause \d+/\d+/?\d*)')
+# Chunk counts at or above this use a process pool for index building;
+# below it, fork and pickle overhead outweighs the parallel win
+_PARALLEL_INDEX_MIN = 2000
+
+
+def _extract_keywords(text: str, language: str) -> set:
+    """Extract the keyword set of a normalized text for indexing.
+    
+    Module-level (rather than a method) so index workers can pickle it
+    by reference; deduplicated from the start so repeated words across a
+    long chunk hash into the set once instead of piling up in an
+    intermediate list.
+    """
+    keywords = set()
+
+    if language == "ar":
+        # Standard references
+        keywords.update(m.group(0) for m in _AR_STD_RE.finditer(text))
+
+        # Common Islamic finance terms, found in one scan
+        keywords.update(_scan_ar_terms(text))
+
+        # Other significant words
+        for word in text.split():
+            if len(word) > 3 and word.isalpha():
+                keywords.add(word)
+
+    else:
+        # Standard references
+        keywords.update(m.group(0) for m in _EN_STD_RE.finditer(text))
+
+        # Islamic finance terms, found in one scan
+        text_lower = text.lower()
+        keywords.update(_scan_en_terms(text_lower))
+
+        # Extract other significant words
+        keywords.update(_EN_WORD_RE.findall(text_lower))
+
+    return keywords
+
+
+def _index_chunk(args) -> tuple:
+    """Per-chunk index work: normalize, extract keywords, find standards.
+    
+    Independent across chunks, so shards of these calls can run in
+    worker processes and be merged in order by the caller.
+    """
+    chunk_id, raw_text, language = args
+    text = _normalize_cached(raw_text, language) if raw_text else ""
+    std_re = _AR_STD_RE if language == "ar" else _EN_STD_RE
+    standard_numbers = sorted({int(n) for n in std_re.findall(raw_text)})
+    return chunk_id, text, _extract_keywords(text, language), standard_numbers
+
 
 class AAOIFIKnowledgeBase:
     """Knowledge base for querying AAOIFI standards"""
     
     def __init__(self):
         self.processor = None
-        self.index = {"ar": {}, "en": {}}
+        # CSR-style inverted index: term string -> small int id; postings
+        # for term t live in postings[offsets[t]:offsets[t+1]] as a compact
+        # int array instead of a dict of Python lists
+        self._term_to_id = {"ar": {}, "en": {}}
+        self._postings = {"ar": array('i'), "en": array('i')}
+        self._offsets = {"ar": array('i', [0]), "en": array('i', [0])}
+        # Per-chunk normalized text and token sets, parallel arrays in
+        # index order; repeated verifications against a chunk reuse these
+        # instead of re-normalizing and re-splitting its text
+        self._chunk_norm = {"ar": [], "en": []}
+        self._chunk_tokens = {"ar": [], "en": []}
+        self._chunk_sentences = {"ar": [], "en": []}
+        self._chunk_idx = {"ar": {}, "en": {}}
+        # standard number -> chunk ids and word total, swept once at
+        # build time; listings and overviews become dict lookups
+        self._standards_index = {"ar": {}, "en": {}}
+        # Identical queries repeat in interactive use; memoize the scored
+        # results per (query, language, limit) on this instance
+        self._search_core = lru_cache(maxsize=256)(self._search_core)
         
     def load_data(self, processor: DataProcessor):
         """Load data from processor and build index"""
         self.processor = processor
+        self._search_core.cache_clear()
         self._build_search_index()
     
     def _build_search_index(self):
@@ -20,107 +166,129 @@ class AAOIFIKnowledgeBase:
         if not self.processor:
             return
             
-        # Index Arabic chunks
-        for chunk in self.processor.arabic_chunks:
-            chunk_id = chunk.get("id")
-            text = self.processor.normalize_text(chunk.get("text", ""), "ar")
-            keywords = self._extract_keywords(text, "ar")
+        for language, chunks in (("ar", self.processor.arabic_chunks),
+                                 ("en", self.processor.english_chunks)):
+            term_to_id = {}
+            term_postings = []  # per-term chunk-id lists, flattened below
+            chunk_norm = []
+            chunk_tokens = []
+            chunk_sentences = []
+            chunk_idx = {}
+            standards = {}
+            
+            jobs = [(chunk.get("id"), chunk.get("text", ""), language)
+                    for chunk in chunks]
+            # The per-chunk work is independent; large corpora fan it out
+            # across worker processes and merge the shards here in order
+            if len(jobs) >= _PARALLEL_INDEX_MIN:
+                with ProcessPoolExecutor() as executor:
+                    extracted = list(executor.map(_index_chunk, jobs, chunksize=64))
+            else:
+                extracted = [_index_chunk(job) for job in jobs]
             
-            for keyword in keywords:
-                if keyword not in self.index["ar"]:
-                    self.index["ar"][keyword] = []
-                self.index["ar"][keyword].append(chunk_id)
-        
-        # Index English chunks
-        for chunk in self.processor.english_chunks:
-            chunk_id = chunk.get("id")
-            text = self.processor.normalize_text(chunk.get("text", ""), "en")
-            keywords = self._extract_keywords(text, "en")
+            for chunk, (chunk_id, text, keywords, standard_numbers) in zip(chunks, extracted):
+                # Record which standards this chunk mentions, so listings
+                # never re-scan the corpus
+                for number in standard_numbers:
+                    entry = standards.setdefault(
+                        number, {"number": number, "chunk_ids": [], "total_words": 0})
+                    entry["chunk_ids"].append(chunk_id)
+                    entry["total_words"] += chunk.get("word_count", 0)
+                
+                # The normalized text and its token set make later
+                # per-chunk overlap checks pay only for the reference side
+                chunk_idx[chunk_id] = len(chunk_norm)
+                chunk_norm.append(text)
+                # Interning collapses the many copies of each token that
+                # recur across chunks into one shared string object
+                chunk_tokens.append(frozenset(map(sys.intern, text.split())))
+                # Pre-split sentences with their token sets, so per-claim
+                # reference lookups never re-split the chunk
+                chunk_sentences.append([
+                    (sentence, frozenset(map(sys.intern, sentence.split())))
+                    for sentence in _SENT_SPLIT_RE.split(text)
+                    if len(sentence.strip()) >= 10])
+                
+                for keyword in keywords:
+                    term_id = term_to_id.setdefault(sys.intern(keyword), len(term_to_id))
+                    if term_id == len(term_postings):
+                        term_postings.append([])
+                    term_postings[term_id].append(chunk_id)
             
-            for keyword in keywords:
-                if keyword not in self.index["en"]:
-                    self.index["en"][keyword] = []
-                self.index["en"][keyword].append(chunk_id)
+            # Flatten into CSR form: one contiguous int array plus offsets
+            postings = array('i')
+            offsets = array('i', [0])
+            for plist in term_postings:
+                postings.extend(plist)
+                offsets.append(len(postings))
+            
+            self._term_to_id[language] = term_to_id
+            self._postings[language] = postings
+            self._offsets[language] = offsets
+            self._chunk_norm[language] = chunk_norm
+            self._chunk_tokens[language] = chunk_tokens
+            self._chunk_sentences[language] = chunk_sentences
+            self._chunk_idx[language] = chunk_idx
+            self._standards_index[language] = standards
+    
+    def get_chunk_tokens(self, chunk_id: int, language: str) -> Optional[frozenset]:
+        """Precomputed token set of a chunk's normalized text"""
+        idx = self._chunk_idx[language].get(chunk_id)
+        if idx is None:
+            return None
+        return self._chunk_tokens[language][idx]
+    
+    def get_chunk_norm_text(self, chunk_id: int, language: str) -> Optional[str]:
+        """Precomputed normalized text of a chunk"""
+        idx = self._chunk_idx[language].get(chunk_id)
+        if idx is None:
+            return None
+        return self._chunk_norm[language][idx]
+    
+    def get_chunk_sentences(self, chunk_id: int, language: str) -> Optional[list]:
+        """Precomputed (sentence, token set) pairs of a chunk"""
+        idx = self._chunk_idx[language].get(chunk_id)
+        if idx is None:
+            return None
+        return self._chunk_sentences[language][idx]
     
     def _extract_keywords(self, text: str, language: str) -> List[str]:
         """Extract keywords from text for indexing"""
-        if language == "ar":
-            # Arabic keywords
-            keywords = []
-            
-            # Standard references
-            standards = re.findall(r'المعيار الشرعي رقم \(\d+\)', text)
-            keywords.extend(standards)
-            
-            # Common Islamic finance terms
-            islamic_terms = [
-                'الربا', 'الغرر', 'الميسر', 'الحلال', 'الحرام', 'المرابحة', 'المضاربة',
-                'الإجارة', 'السلم', 'الاستصناع', 'المشاركة', 'الصكوك', 'الضمان',
-                'العملات', 'البطاقة', 'الائتمان', 'التمويل', 'الاستثمار'
-            ]
-            
-            for term in islamic_terms:
-                if term in text:
-                    keywords.append(term)
-            
-            # Extract other significant words (length > 3)
-            words = text.split()
-            for word in words:
-                if len(word) > 3 and word.isalpha():
-                    keywords.append(word)
-        
-        else:
-            # English keywords
-            keywords = []
-            
-            # Standard references
-            standards = re.findall(r"Shari'ah Standard No\. \(\d+\)", text)
-            keywords.extend(standards)
-            
-            # Islamic finance terms
-            islamic_terms = [
-                'riba', 'gharar', 'halal', 'haram', 'murabahah', 'mudarabah',
-                'ijarah', 'salam', 'istisna', 'musharakah', 'sukuk', 'guarantee',
-                'currency', 'card', 'credit', 'financing', 'investment', 'islamic',
-                'sharia', 'shariah', 'permissible', 'prohibited'
-            ]
-            
-            text_lower = text.lower()
-            for term in islamic_terms:
-                if term in text_lower:
-                    keywords.append(term)
-            
-            # Extract other significant words
-            words = re.findall(r'\b\w{4,}\b', text_lower)
-            keywords.extend(words)
-        
-        return list(set(keywords))  # Remove duplicates
+        return list(_extract_keywords(text, language))
     
     def search(self, query: str, language: str, limit: int = 10) -> List[Dict]:
         """Search the knowledge base"""
         if not self.processor:
             return []
         
+        # Hand out copies so callers cannot mutate cached results
+        return [dict(result) for result in self._search_core(query, language, limit)]
+    
+    def _search_core(self, query: str, language: str, limit: int) -> tuple:
+        """Score, rank and materialize search results (memoized)"""
         # Normalize query
         normalized_query = self.processor.normalize_text(query, language)
         query_keywords = self._extract_keywords(normalized_query, language)
         
         if not query_keywords:
-            return []
+            return ()
         
-        # Score chunks based on keyword matches
-        chunk_scores = {}
+        # Score chunks based on keyword matches: Counter.update consumes
+        # each CSR posting slice in one C-level pass instead of two dict
+        # lookups per hit
+        term_to_id = self._term_to_id[language]
+        postings = self._postings[language]
+        offsets = self._offsets[language]
+        chunk_scores = Counter()
         
         for keyword in query_keywords:
-            if keyword in self.index[language]:
-                for chunk_id in self.index[language][keyword]:
-                    if chunk_id not in chunk_scores:
-                        chunk_scores[chunk_id] = 0
-                    chunk_scores[chunk_id] += 1
+            term_id = term_to_id.get(keyword)
+            if term_id is not None:
+                chunk_scores.update(postings[offsets[term_id]:offsets[term_id + 1]])
         
-        # Get top scoring chunks
-        sorted_chunks = sorted(chunk_scores.items(), key=lambda x: x[1], reverse=True)
-        top_chunk_ids = [chunk_id for chunk_id, _ in sorted_chunks[:limit]]
+        # Get top scoring chunks: most_common is a bounded heap selection,
+        # O(N log limit) instead of fully sorting every matched chunk
+        top_chunk_ids = [chunk_id for chunk_id, _ in chunk_scores.most_common(limit)]
         
         # Prepare results
         results = []
@@ -145,42 +313,32 @@ class AAOIFIKnowledgeBase:
                     "standard": self._extract_standard_number(chunk.get("text", ""), language)
                 })
         
-        return results
+        return tuple(results)
     
     def _find_reference_in_chunk(self, chunk: Dict, query: str, language: str) -> Optional[str]:
         """Find the most relevant reference within a chunk"""
         text = chunk.get("text", "")
+        ref_re = _AR_ANY_REF if language == "ar" else _EN_ANY_REF
         
-        # Look for standard references
-        if language == "ar":
-            standards = re.findall(r'المعيار الشرعي رقم \(\d+\)', text)
-            if standards:
-                return standards[0]
-                
-            # Look for clause references
-            clauses = re.findall(r'البند \d+/\d+/?\d*', text)
-            if clauses:
-                return clauses[0]
-        else:
-            standards = re.findall(r"Shari'ah Standard No\. \(\d+\)", text)
-            if standards:
-                return standards[0]
-                
-            # Look for clause references
-            clauses = re.findall(r'Clause \d+/\d+/?\d*', text)
-            if clauses:
-                return clauses[0]
+        # One pass over the chunk; a standard reference anywhere still
+        # beats an earlier clause reference
+        first_clause = None
+        for match in ref_re.finditer(text):
+            if match.lastgroup == "std":
+                return match.group(0)
+            if first_clause is None:
+                first_clause = match.group(0)
         
-        return None
+        return first_clause
     
     def _extract_standard_number(self, text: str, language: str) -> Optional[str]:
         """Extract standard number from text"""
         if language == "ar":
-            match = re.search(r'المعيار الشرعي رقم \((\d+)\)', text)
+            match = _AR_STD_RE.search(text)
             if match:
                 return f"المعيار رقم {match.group(1)}"
         else:
-            match = re.search(r"Shari'ah Standard No\. \((\d+)\)", text)
+            match = _EN_STD_RE.search(text)
             if match:
                 return f"Standard No. {match.group(1)}"
         
@@ -190,14 +348,14 @@ class AAOIFIKnowledgeBase:
         """Get overview of a specific standard"""
         if not self.processor:
             return None
-        chunks = self.processor.arabic_chunks if language == "ar" else self.processor.english_chunks
         
-        pattern = f"المعيار الشرعي رقم \\({standard_number}\\)" if language == "ar" else f"Shari'ah Standard No\\. \\({standard_number}\\)"
+        entry = self._standards_index[language].get(standard_number)
+        if not entry:
+            return None
         
-        relevant_chunks = []
-        for chunk in chunks:
-            if re.search(pattern, chunk.get("text", "")):
-                relevant_chunks.append(chunk)
+        relevant_chunks = [self.processor.get_chunk_by_id(chunk_id, language)
+                           for chunk_id in entry["chunk_ids"]]
+        relevant_chunks = [chunk for chunk in relevant_chunks if chunk]
         
         if not relevant_chunks:
             return None
@@ -218,27 +376,7 @@ class AAOIFIKnowledgeBase:
         """List all available standards"""
         if not self.processor:
             return []
-        chunks = self.processor.arabic_chunks if language == "ar" else self.processor.english_chunks
-        
-        pattern = r"المعيار الشرعي رقم \((\d+)\)" if language == "ar" else r"Shari'ah Standard No\. \((\d+)\)"
-        
-        standards = {}
-        
-        for chunk in chunks:
-            text = chunk.get("text", "")
-            matches = re.findall(pattern, text)
-            
-            for match in matches:
-                standard_num = int(match)
-                if standard_num not in standards:
-                    standards[standard_num] = {
-                        "number": standard_num,
-                        "chunk_ids": [],
-                        "total_words": 0
-                    }
-                
-                standards[standard_num]["chunk_ids"].append(chunk.get("id"))
-                standards[standard_num]["total_words"] += chunk.get("word_count", 0)
         
+        standards = self._standards_index[language]
         # Sort by standard number
-        return [standards[num] for num in sorted(standards.keys())]
+        return [standards[num] for num in sorted(standards)]
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+class PromptCache:
+    """Persistent prompt -> response memoization backed by SQLite.
+
+    Generation prompts repeat within a run (random seed draws from a finite
+    pool) and across resumed runs; each repeat costs a full network
+    round-trip. Caching responses keyed by the SHA-256 of the prompt
+    short-circuits those calls entirely. Entries are evicted
+    least-recently-used once the table exceeds max_entries.
+
+    The owning client is shared across Streamlit script-runner threads
+    (st.cache_resource), so the connection is opened with
+    check_same_thread=False and every statement runs under a lock.
+    """
+
+    def __init__(self, path: str = "progress/prompt_cache.db", max_entries: int = 100000):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prompt_cache ("
+            "prompt_sha256 BLOB PRIMARY KEY, "
+            "response_json TEXT NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str) -> bytes:
+        return hashlib.sha256(prompt.encode('utf-8')).digest()
+
+    def get(self, prompt: str) -> Optional[Tuple[str, dict]]:
+        """Return the cached (response_text, metadata) for a prompt, if any"""
+        key = self._key(prompt)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response_json FROM prompt_cache WHERE prompt_sha256 = ?",
+                (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._conn.execute(
+                "UPDATE prompt_cache SET last_access = ? WHERE prompt_sha256 = ?",
+                (time.time(), key)
+            )
+            self._conn.commit()
+
+        stored = json.loads(row[0])
+        return stored["response_text"], stored["metadata"]
+
+    def put(self, prompt: str, response_text: str, metadata: dict):
+        """Store a successful response, evicting LRU entries beyond capacity"""
+        payload = json.dumps(
+            {"response_text": response_text, "metadata": metadata},
+            ensure_ascii=False
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prompt_cache VALUES (?, ?, ?)",
+                (self._key(prompt), payload, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM prompt_cache WHERE prompt_sha256 IN ("
+                "SELECT prompt_sha256 FROM prompt_cache "
+                "ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
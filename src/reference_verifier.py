@@ -1,31 +1,156 @@
 import re
 import unicodedata
+import zlib
+from array import array
 from typing import Tuple, Optional
-from difflib import SequenceMatcher
 from src.data_processor import DataProcessor
+from src.fuzzy import lev_ratio, windowed_lev_ratio
+
+try:
+    from rapidfuzz import fuzz  # optional: C-level partial-ratio alignment
+except ImportError:
+    fuzz = None
+
+# Patterns used on every normalization and structured-reference parse
+_SENT_SPLIT_RE = re.compile(r'[.!?\u061F]\s+')  # includes the Arabic question mark
+# Arabic diacritics (plus tatweel) deleted via str.translate, which is a
+# C-level character-map pass instead of a regex substitution
+_AR_DIAC_TABLE = dict.fromkeys(list(range(0x064B, 0x0653)) + [0x0670, 0x0640], None)
+
+# Bloom filter over source character trigrams: 2^23 bits (1 MiB), two
+# crc32-based hash positions per trigram, sized so a megabyte-scale
+# source stays sparse enough for a useful false-positive rate.
+# References sharing almost no trigrams with the source are rejected
+# before the fuzzy-matching steps run
+_BLOOM_BITS = 1 << 23
+_BLOOM_MASK = _BLOOM_BITS - 1
+
+
+def _bloom_build(data: bytes) -> bytearray:
+    bloom = bytearray(_BLOOM_BITS >> 3)
+    crc = zlib.crc32
+    # Dedupe first: the source repeats its trigrams heavily, so hashing
+    # each distinct one once does a fraction of the work
+    for tri in {data[i:i + 3] for i in range(len(data) - 2)}:
+        for h in (crc(tri) & _BLOOM_MASK, crc(tri, 0x9E3779B9) & _BLOOM_MASK):
+            bloom[h >> 3] |= 1 << (h & 7)
+    return bloom
+
+
+def _bloom_hit_fraction(data: bytes, bloom: bytearray) -> float:
+    total = len(data) - 2
+    if total <= 0:
+        return 1.0
+    crc = zlib.crc32
+    hits = 0
+    for i in range(total):
+        tri = data[i:i + 3]
+        h1 = crc(tri) & _BLOOM_MASK
+        h2 = crc(tri, 0x9E3779B9) & _BLOOM_MASK
+        if bloom[h1 >> 3] >> (h1 & 7) & 1 and bloom[h2 >> 3] >> (h2 & 7) & 1:
+            hits += 1
+    return hits / total
+
 
 class ReferenceVerifier:
     """Verifies references against source text to prevent hallucinations"""
     
-    def __init__(self, processor: DataProcessor):
+    # All structured-reference shapes per language fused into one
+    # alternation: a single finditer pass replaces up to five sequential
+    # searches over the same string. Each alternative captures its kind
+    # (outer group) and its numeric value (inner <kind>_v group)
+    _ANY_REF = {
+        "ar": re.compile(
+            r'(?P<std>\u0627\u0644\u0645\u0639\u064a\u0627\u0631 \u0627\u0644\u0634\u0631\u0639\u064a \u0631\u0642\u0645 \((?P<std_v>\d+)\))'
+            r'|(?P<clause>\u0627\u0644\u0628\u0646\u062f (?P<clause_v>\d+/\d+/?\d*))'
+            r'|(?P<para>\u0627\u0644\u0641\u0642\u0631\u0629 (?P<para_v>\d+))'
+            r'|(?P<page>\u0627\u0644\u0635\u0641\u062d\u0629 (?P<page_v>\d+))',
+            re.IGNORECASE),
+        "en": re.compile(
+            r"(?P<std>Shari'ah Standard No\. \((?P<std_v>\d+)\))"
+            r"|(?P<gstd>Standard No\. (?P<gstd_v>\d+))"
+            r"|(?P<clause>Clause (?P<clause_v>\d+/\d+/?\d*))"
+            r"|(?P<para>Paragraph (?P<para_v>\d+))"
+            r"|(?P<page>Page (?P<page_v>\d+))",
+            re.IGNORECASE)
+    }
+    # Kinds in decreasing specificity; the best-ranked hit wins
+    _REF_PRIORITY = {
+        "ar": ("std", "clause", "para", "page"),
+        "en": ("std", "gstd", "clause", "para", "page")
+    }
+    
+    def __init__(self, processor: DataProcessor, knowledge_base=None):
         self.processor = processor
+        # Optional knowledge base whose index holds precomputed per-chunk
+        # token sets; without one, chunk tokens are computed lazily here
+        self.knowledge_base = knowledge_base
+        # Normalized source text and its token set, computed once per
+        # language instead of on every verification
+        self._norm_source = {}
+        self._norm_source_tokens = {}
+        self._chunk_tokens = {}
+        self._chunk_sentences = {}
+        self._bloom = {}
+        self._source_cp = {}
         
+    def _get_norm_source(self, language: str) -> str:
+        """Normalized source text for a language (computed once, cached)"""
+        if language not in self._norm_source:
+            # The processor keeps a sidecar-backed normalized copy whose
+            # normalization matches normalize_for_comparison
+            self._norm_source[language] = self.processor.get_normalized_source_text(language)
+        return self._norm_source[language]
+
+    def _get_source_tokens(self, language: str) -> frozenset:
+        """Token set of the normalized source (computed once, cached)"""
+        if language not in self._norm_source_tokens:
+            self._norm_source_tokens[language] = frozenset(self._get_norm_source(language).split())
+        return self._norm_source_tokens[language]
+
+    def _get_bloom(self, language: str) -> bytearray:
+        """Trigram bloom filter over the normalized source (built once)"""
+        if language not in self._bloom:
+            self._bloom[language] = _bloom_build(
+                self._get_norm_source(language).encode('utf-8'))
+        return self._bloom[language]
+
+    def _get_source_cp(self, language: str) -> array:
+        """Code-point array of the normalized source (computed once).
+
+        The pure-Python Levenshtein fallback runs faster on int arrays
+        than on str, and converting the multi-MB source on every verify
+        would dwarf the comparison itself.
+        """
+        if language not in self._source_cp:
+            self._source_cp[language] = array('I', map(ord, self._get_norm_source(language)))
+        return self._source_cp[language]
+
+    def reset_cache(self):
+        """Drop cached source normalizations (call after a processor reload)"""
+        self._norm_source.clear()
+        self._norm_source_tokens.clear()
+        self._chunk_tokens.clear()
+        self._chunk_sentences.clear()
+        self._bloom.clear()
+        self._source_cp.clear()
+
     def normalize_for_comparison(self, text: str, language: str = "en") -> str:
         """Normalize text for reference comparison"""
         if not text:
             return ""
             
-        # Unicode normalization
-        text = unicodedata.normalize('NFKC', text)
-        
-        # Collapse whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        # Unicode normalization, then whitespace collapse via split/join:
+        # one C-level tokenizing pass that also strips, instead of a regex
+        # substitution plus a separate strip over fresh buffers
+        text = ' '.join(unicodedata.normalize('NFKC', text).split())
         
         if language == "en":
             text = text.lower()
         elif language == "ar":
+            # lower() is a no-op for Arabic and skipped
             # Remove Arabic diacritics for better matching
-            text = re.sub(r'[\u064B-\u0652\u0670\u0640]', '', text)
+            text = text.translate(_AR_DIAC_TABLE)
             
         return text
     
@@ -43,56 +168,127 @@ class ReferenceVerifier:
         overlap = len(ref_tokens & source_tokens)
         return overlap / len(ref_tokens)
     
-    def compute_levenshtein_similarity(self, reference: str, source_text: str, language: str = "en") -> float:
-        """Compute normalized Levenshtein similarity"""
+    @staticmethod
+    def _token_overlap_norm(ref_norm: str, source_tokens: frozenset) -> float:
+        """Token overlap for an already-normalized reference"""
+        ref_tokens = set(ref_norm.split())
+        if not ref_tokens:
+            return 0.0
+        return len(ref_tokens & source_tokens) / len(ref_tokens)
+    
+    def _get_chunk_tokens(self, chunk_id: int, language: str) -> Optional[frozenset]:
+        """Token set of a chunk's normalized text, precomputed or cached"""
+        if self.knowledge_base is not None:
+            tokens = self.knowledge_base.get_chunk_tokens(chunk_id, language)
+            if tokens is not None:
+                return tokens
+        
+        key = (chunk_id, language)
+        if key not in self._chunk_tokens:
+            chunk = self.processor.get_chunk_by_id(chunk_id, language)
+            if not chunk:
+                return None
+            chunk_norm = self.normalize_for_comparison(chunk.get("text", ""), language)
+            self._chunk_tokens[key] = frozenset(chunk_norm.split())
+        return self._chunk_tokens[key]
+    
+    def _get_chunk_sentences(self, chunk_id: int, language: str) -> list:
+        """(sentence, token set) pairs of a chunk, precomputed or cached"""
+        if self.knowledge_base is not None:
+            sentences = self.knowledge_base.get_chunk_sentences(chunk_id, language)
+            if sentences is not None:
+                return sentences
+        
+        key = (chunk_id, language)
+        if key not in self._chunk_sentences:
+            chunk = self.processor.get_chunk_by_id(chunk_id, language)
+            if not chunk:
+                return []
+            chunk_norm = self.normalize_for_comparison(chunk.get("text", ""), language)
+            self._chunk_sentences[key] = [
+                (sentence, frozenset(sentence.split()))
+                for sentence in _SENT_SPLIT_RE.split(chunk_norm)
+                if len(sentence.strip()) >= 10]
+        return self._chunk_sentences[key]
+    
+    def compute_token_overlap_chunk(self, reference: str, chunk_id: int, language: str = "en") -> float:
+        """Token overlap of a reference against a chunk's precomputed tokens.
+        
+        Only the reference side is normalized and split; the chunk side
+        comes from the index (or a local cache), so repeated checks
+        against the same chunk cost O(|reference|).
+        """
+        chunk_tokens = self._get_chunk_tokens(chunk_id, language)
+        if chunk_tokens is None:
+            return 0.0
+        
+        ref_tokens = set(self.normalize_for_comparison(reference, language).split())
+        if not ref_tokens:
+            return 0.0
+        return len(ref_tokens & chunk_tokens) / len(ref_tokens)
+    
+    def compute_levenshtein_similarity(self, reference: str, source_text: str, language: str = "en",
+                                       early_exit: float = 1.1) -> float:
+        """Compute normalized Levenshtein similarity.
+        
+        Callers that only need to know whether the score clears a
+        threshold can pass it as early_exit to stop the scan at the
+        first window reaching it.
+        """
         ref_norm = self.normalize_for_comparison(reference, language)
         source_norm = self.normalize_for_comparison(source_text, language)
+        return self._lev_norm(ref_norm, source_norm, language, early_exit)
+    
+    def _lev_norm(self, ref_norm: str, source_norm: str, language: str,
+                  early_exit: float = 1.1) -> float:
+        """Levenshtein similarity for already-normalized inputs"""
+        # rapidfuzz's partial_ratio considers every alignment of the
+        # reference against the source in C, where the fallback samples
+        # reference-sized windows in Python; a score_cutoff lets the C
+        # kernel stop early too (scores below it report as 0)
+        if fuzz is not None:
+            if early_exit <= 1.0:
+                return fuzz.partial_ratio(ref_norm, source_norm,
+                                          score_cutoff=early_exit * 100) / 100.0
+            return fuzz.partial_ratio(ref_norm, source_norm) / 100.0
         
-        # For efficiency, limit source text length for comparison
+        # For efficiency, scan long sources in reference-sized windows,
+        # as code-point arrays; the source-side conversion is reused from
+        # the per-language cache when the full source is being matched
         if len(source_norm) > 10000:
-            # Find the best matching substring in source
-            best_ratio = 0.0
-            ref_len = len(ref_norm)
-            
-            for i in range(0, len(source_norm) - ref_len + 1, 100):  # Step by 100 chars
-                substr = source_norm[i:i + ref_len * 2]  # Check 2x reference length
-                ratio = SequenceMatcher(None, ref_norm, substr).ratio()
-                best_ratio = max(best_ratio, ratio)
-                
-            return best_ratio
-        else:
-            return SequenceMatcher(None, ref_norm, source_norm).ratio()
+            ref_cp = array('I', map(ord, ref_norm))
+            if source_norm is self._norm_source.get(language):
+                source_cp = self._get_source_cp(language)
+            else:
+                source_cp = array('I', map(ord, source_norm))
+            return windowed_lev_ratio(ref_cp, source_cp, early_exit=early_exit)
+        return lev_ratio(ref_norm, source_norm)
     
     def extract_structured_reference(self, reference: str, language: str = "en") -> Optional[dict]:
         """Extract structured information from reference strings"""
         if not reference or reference.upper() == "UNKNOWN":
             return None
             
-        patterns = {
-            "ar": [
-                r'المعيار الشرعي رقم \((\d+)\)',
-                r'البند (\d+/\d+/?\d*)',
-                r'الفقرة (\d+)',
-                r'الصفحة (\d+)'
-            ],
-            "en": [
-                r"Shari'ah Standard No\. \((\d+)\)",
-                r"Standard No\. (\d+)",
-                r"Clause (\d+/\d+/?\d*)",
-                r"Paragraph (\d+)",
-                r"Page (\d+)"
-            ]
-        }
+        pattern = self._ANY_REF.get(language, self._ANY_REF["en"])
+        priority = self._REF_PRIORITY.get(language, self._REF_PRIORITY["en"])
         
-        for pattern in patterns.get(language, patterns["en"]):
-            match = re.search(pattern, reference, re.IGNORECASE)
-            if match:
-                return {
-                    "type": "structured",
-                    "pattern": pattern,
-                    "value": match.group(1),
-                    "full_match": match.group(0)
-                }
+        best = None
+        best_rank = len(priority)
+        for match in pattern.finditer(reference):
+            rank = next(i for i, kind in enumerate(priority) if match.group(kind))
+            if rank < best_rank:
+                best, best_rank = match, rank
+                if rank == 0:
+                    break
+        
+        if best is not None:
+            kind = priority[best_rank]
+            return {
+                "type": "structured",
+                "kind": kind,
+                "value": best.group(kind + "_v"),
+                "full_match": best.group(kind)
+            }
         
         return {"type": "unstructured", "text": reference}
     
@@ -121,9 +317,10 @@ class ReferenceVerifier:
                 "error": "Source text not available"
             }
         
-        # Step 1: Exact substring match (after normalization)
+        # Step 1: Exact substring match (after normalization); the source
+        # side comes from the per-language cache
         ref_norm = self.normalize_for_comparison(reference, language)
-        source_norm = self.normalize_for_comparison(source_text, language)
+        source_norm = self._get_norm_source(language)
         
         if ref_norm in source_norm:
             return True, {
@@ -132,8 +329,21 @@ class ReferenceVerifier:
                 "verification_method": "exact_match"
             }
         
-        # Step 2: Token overlap analysis
-        token_overlap = self.compute_token_overlap(reference, source_text, language)
+        # Early reject: a reference whose character trigrams barely appear
+        # in the source cannot pass any of the fuzzy steps below, so skip
+        # their cost after a few bit tests
+        trigram_hits = _bloom_hit_fraction(ref_norm.encode('utf-8'), self._get_bloom(language))
+        if trigram_hits < 0.1:
+            return False, {
+                "reference": "UNKNOWN",
+                "suspected_fabrication": True,
+                "verification_method": "bloom_early_reject",
+                "original_reference": reference,
+                "trigram_hit_fraction": trigram_hits
+            }
+        
+        # Step 2: Token overlap analysis against the cached source tokens
+        token_overlap = self._token_overlap_norm(ref_norm, self._get_source_tokens(language))
         
         if token_overlap >= token_threshold:
             return True, {
@@ -143,8 +353,12 @@ class ReferenceVerifier:
                 "token_overlap_ratio": token_overlap
             }
         
-        # Step 3: Levenshtein similarity for fuzzy matching
-        levenshtein_sim = self.compute_levenshtein_similarity(reference, source_text, language)
+        # Step 3: Levenshtein similarity for fuzzy matching; the single
+        # ref_norm from step 1 and the cached source normalization are
+        # reused, and the scan stops at the first window that already
+        # clears the acceptance threshold
+        levenshtein_sim = self._lev_norm(ref_norm, source_norm, language,
+                                         early_exit=levenshtein_threshold)
         
         if levenshtein_sim >= levenshtein_threshold:
             return True, {
@@ -187,37 +401,30 @@ class ReferenceVerifier:
         """
         source_text = self.processor.get_source_text(language)
         
-        # If context chunk provided, search within that chunk first
+        # If context chunk provided, search within that chunk first.
+        # The claim is normalized and tokenized once; the chunk side comes
+        # pre-split and pre-tokenized from the index (or a local cache),
+        # so each candidate sentence costs a single set intersection
         if context_chunk_id is not None:
-            chunk = self.processor.get_chunk_by_id(context_chunk_id, language)
-            if chunk:
-                chunk_text = chunk.get("text", "")
-                
-                # Simple approach: find the most similar sentence/paragraph
-                claim_norm = self.normalize_for_comparison(claim, language)
-                chunk_norm = self.normalize_for_comparison(chunk_text, language)
-                
-                # Split into sentences and find best match
-                sentences = re.split(r'[.!?]\s+', chunk_norm)
-                
-                best_sentence = ""
-                best_score = 0.0
-                
-                for sentence in sentences:
-                    if len(sentence.strip()) < 10:  # Skip very short sentences
-                        continue
-                        
-                    score = self.compute_token_overlap(claim, sentence, language)
+            claim_norm = self.normalize_for_comparison(claim, language)
+            claim_tokens = set(claim_norm.split())
+            
+            best_sentence = ""
+            best_score = 0.0
+            
+            if claim_tokens:
+                for sentence, sentence_tokens in self._get_chunk_sentences(context_chunk_id, language):
+                    score = len(claim_tokens & sentence_tokens) / len(claim_tokens)
                     if score > best_score:
                         best_score = score
                         best_sentence = sentence
-                
-                if best_score > 0.3:  # Reasonable threshold
-                    return best_sentence[:200] + "..." if len(best_sentence) > 200 else best_sentence, {
-                        "verification_method": "chunk_sentence_match",
-                        "chunk_id": context_chunk_id,
-                        "match_score": best_score
-                    }
+            
+            if best_score > 0.3:  # Reasonable threshold
+                return best_sentence[:200] + "..." if len(best_sentence) > 200 else best_sentence, {
+                    "verification_method": "chunk_sentence_match",
+                    "chunk_id": context_chunk_id,
+                    "match_score": best_score
+                }
         
         # Fallback: return UNKNOWN
         return "UNKNOWN", {
@@ -0,0 +1,38 @@
+import hashlib
+
+
+def _hash64(gram: str) -> int:
+    """Stable 64-bit hash of a token trigram"""
+    return int.from_bytes(
+        hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def simhash(text: str) -> int:
+    """Compute a 64-bit SimHash over the text's token trigrams.
+
+    Near-identical texts (a flipped word, an off-by-one standard number)
+    produce hashes within a few bits of each other, so Hamming distance on
+    the result is a cheap near-duplicate test.
+    """
+    tokens = text.split()
+    if not tokens:
+        return 0
+
+    grams = [' '.join(tokens[i:i + 3]) for i in range(max(1, len(tokens) - 2))]
+
+    counters = [0] * 64
+    for gram in grams:
+        h = _hash64(gram)
+        for bit in range(64):
+            counters[bit] += 1 if (h >> bit) & 1 else -1
+
+    value = 0
+    for bit in range(64):
+        if counters[bit] > 0:
+            value |= 1 << bit
+    return value
+
+
+def is_near_duplicate(candidate: int, seen, max_distance: int = 3) -> bool:
+    """Check whether a SimHash is within max_distance bits of any seen hash"""
+    return any((candidate ^ s).bit_count() <= max_distance for s in seen)